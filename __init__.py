@@ -1,2 +1,36 @@
-from .log import logger
 from .types import N, Record, RoRecord
+
+# PEP 562: 子模块和 logger 在第一次访问时才导入，`import zex` 只加载 zex.types
+_SUBMODULES = {
+    "decorators",
+    "fs",
+    "log",
+    "more",
+    "utils",
+    "validate",
+    "xdict",
+    "xdiff",
+    "xdt",
+    "xglob",
+    "xio",
+    "xlist",
+    "xnet",
+    "xstr",
+}
+
+
+def __getattr__(name: str):
+    if name == "logger":
+        from .log import logger
+
+        globals()["logger"] = logger
+        return logger
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), "logger", *_SUBMODULES})
@@ -0,0 +1,33 @@
+# python benchmarks/bench_local_storage.py (需要可以导入 zex)
+import time
+import tempfile
+from multiprocessing import Process
+from zex import fs
+from zex.utils.local_storage import IndexedLocalStorage, LocalStorage
+
+
+def worker(cls, fp: str, wid: int, n: int, batch: int):
+    # 定义在模块顶层，spawn 启动方式 (macOS/Windows 的默认方式) 下子进程可以导入
+    storage = cls(fp, "id")
+    for i in range(0, n, batch):
+        with storage.transaction():
+            for j in range(i, min(i + batch, n)):
+                storage.add({"id": f"{wid}-{j}"})
+                storage.has(f"{wid}-{j}")
+
+
+if __name__ == "__main__":
+    for cls, n, batch in [(LocalStorage, 200, 1), (IndexedLocalStorage, 200, 1), (IndexedLocalStorage, 2000, 100)]:
+        fp = fs.join(tempfile.mkdtemp(), "storage.json")
+        procs = [Process(target=worker, args=(cls, fp, w, n, batch)) for w in range(8)]
+        t = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t
+        assert all(p.exitcode == 0 for p in procs)
+        with cls(fp, "id").transaction() as storage:
+            total = len(storage.data)
+        assert total == 8 * n, total
+        print(f"[BENCH] {cls.__name__} x 8 processes, batch={batch}: {8 * n * 2 / elapsed:.0f} ops/s")
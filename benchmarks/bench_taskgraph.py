@@ -0,0 +1,49 @@
+# python benchmarks/bench_taskgraph.py (需要可以导入 zex)
+import time
+import random
+from typing import Dict
+from zex.more.taskgraph import CycleError, Node, sort_dependencies
+
+
+def bench_sort(n: int, fanin=3):
+    deps = [(None, "0")]
+    for i in range(1, n):
+        for j in random.sample(range(i), min(i, fanin)):
+            deps.append((str(j), str(i)))
+    t = time.perf_counter()
+    items = sort_dependencies(deps)
+    print(f"[BENCH] {n} nodes, {len(deps)} edges: {time.perf_counter() - t:.3f}s")
+    assert len(items) == n
+    pos = {name: i for i, name in enumerate(items)}
+    assert all(pos[a] < pos[b] for a, b in deps if a)
+
+
+def bench_traversal(title: str, nodes: Dict[str, Node], expected: int):
+    t = time.perf_counter()
+    n = len(nodes["0"].descendants())
+    print(f"[BENCH] {title}: {n} descendants in {time.perf_counter() - t:.3f}s")
+    assert n == expected
+
+
+if __name__ == "__main__":
+    bench_sort(100_000)
+
+    wide = {}
+    for i in range(1, 200_000):
+        Node.get_or_set(wide, "0").add_child(Node.get_or_set(wide, str(i)))
+    bench_traversal("wide (1 x 200k)", wide, 199_999)
+
+    # 每一层的两个节点都指向下一层的两个节点，朴素遍历的访问次数为 2^depth
+    diamond = {}
+    for i in range(0, 2 * 5000, 2):
+        for a in (i, i + 1):
+            for b in (i + 2, i + 3):
+                Node.get_or_set(diamond, str(a)).add_child(Node.get_or_set(diamond, str(b)))
+    bench_traversal("diamond (5000 levels)", diamond, 2 * 5000)
+
+    try:
+        sort_dependencies([("a", "b"), ("b", "c"), ("c", "a"), (None, "a")])
+    except CycleError as e:
+        print("[DEBUG]", e)
+    else:
+        raise AssertionError("CycleError not raised")
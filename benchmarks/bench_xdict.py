@@ -0,0 +1,22 @@
+# python benchmarks/bench_xdict.py (需要可以导入 zex)
+import time
+from zex.xdict import key_omitter, key_picker, omit_keys, pick_keys
+
+if __name__ == "__main__":
+    keys = "id fileSize chunked chunkSize totalChunks saveAs userId overwrite extra"
+    records = [{k: i for k in [*keys.split(" "), "userToken", "destServer"]} for i in range(200_000)]
+    pick = key_picker(keys)
+    omit = key_omitter("userToken destServer")
+
+    results = {}
+    for name, fn in [
+        ("pick_keys", lambda: [pick_keys(d, keys) for d in records]),
+        ("key_picker", lambda: list(pick.map(records))),
+        ("omit_keys", lambda: [omit_keys(d, "userToken destServer") for d in records]),
+        ("key_omitter", lambda: list(omit.map(records))),
+    ]:
+        t = time.perf_counter()
+        results[name] = fn()
+        print(f"[BENCH] {name}: {(time.perf_counter() - t) / len(records) * 1e9:.0f} ns/record")
+    assert results["pick_keys"] == results["key_picker"] == results["omit_keys"] == results["key_omitter"]
+    assert pick.values(records[1]) == omit.values(records[1]) == (1,) * 9
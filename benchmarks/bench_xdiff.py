@@ -0,0 +1,32 @@
+# python benchmarks/bench_xdiff.py (需要可以导入 zex)
+import time
+from zex import xdict, xlist
+from zex.xdiff import diff_records, diff_sorted, iter_chunks
+
+
+def diff_naive(target, ref, key):
+    created, removed, other_t, other_r = xlist.diff(target, ref, key)
+    return created, removed, [xdict.diff(a, b) for a, b in zip(other_t, other_r)]
+
+
+if __name__ == "__main__":
+    n = 500_000
+    ref = [{"id": i, "v": i, "meta": {"a": 1}} for i in range(n)]
+    target = [{"id": i, "v": i + (i % 100 == 0), "meta": {"a": 1}} for i in range(n // 10, n + n // 10)]
+    key = lambda d: d["id"]
+
+    results = {}
+    for name, fn in [
+        ("xlist.diff + xdict.diff", lambda: diff_naive(target, ref, key)),
+        ("diff_records", lambda: list(diff_records(target, ref, key))),
+        ("diff_sorted", lambda: [op for c in iter_chunks(diff_sorted(target, ref, key), 10_000) for op in c]),
+    ]:
+        t = time.perf_counter()
+        results[name] = fn()
+        print(f"[BENCH] {name} {n} rows: {time.perf_counter() - t:.3f}s")
+
+    ops = results["diff_sorted"]
+    assert sorted(ops) == sorted(results["diff_records"])
+    count = lambda kind: sum(1 for op in ops if op.op == kind)
+    assert count("insert") == count("delete") == n // 10
+    assert count("update") == len(range(n // 10, n, 100))
@@ -0,0 +1,38 @@
+# python benchmarks/bench_xlist.py (需要可以导入 zex)
+import time
+from zex.xlist import merge_by_key, merge_sorted, update
+
+
+def update_scan(target, source, key):
+    """按键逐个线性查找的朴素实现，作为对照"""
+    ta = list(range(len(target)))
+    tk_dict = {i: key(target[i]) for i in ta}
+    for item in source:
+        s_k = key(item)
+        for i in ta:
+            if tk_dict[i] == s_k:
+                target[i] = item
+                break
+        else:
+            target.append(item)
+    return target
+
+
+if __name__ == "__main__":
+    key = lambda d: d["id"]
+    for n in (2_000, 10_000, 100_000):
+        target = [{"id": i, "v": 0} for i in range(n)]
+        source = [{"id": i, "v": 1} for i in range(n // 2, n + n // 2)]
+        expected = [*target[: n // 2], *source]
+        funcs = [("update", update), ("merge_by_key", merge_by_key)]
+        if n <= 10_000:
+            funcs.insert(0, ("scan", update_scan))
+        for name, fn in funcs:
+            t = time.perf_counter()
+            result = fn([*target], source, key)
+            print(f"[BENCH] {name} {n} rows: {time.perf_counter() - t:.3f}s")
+            assert result == expected, name
+        t = time.perf_counter()
+        result = list(merge_sorted(target, source, key))
+        print(f"[BENCH] merge_sorted {n} rows: {time.perf_counter() - t:.3f}s")
+        assert result == expected
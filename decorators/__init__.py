@@ -1,5 +1,6 @@
 from ._cache import *
 from ._throttle import *
+from ._ratelimit import *
 from ._deprecated import *
 
 
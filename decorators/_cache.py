@@ -1,11 +1,27 @@
 import time
-import inspect
 from functools import wraps
 
 
+def _invalidate(cached_dct, match=None):
+    """删除满足 `match(key)` 的缓存项，`match` 为 None 时清空缓存"""
+    if match is None:
+        cached_dct.clear()
+        return
+    for key in list(cached_dct):
+        if match(key):
+            cached_dct.pop(key, None)
+
+
+def _pop(cached_dct, keys):
+    """按键直接删除缓存项，不遍历整个缓存"""
+    for key in keys:
+        cached_dct.pop(key, None)
+
+
 def cache(key_fn=None):
     """
-    缓存函数的结果，支持自定义缓存键。
+    缓存函数的结果，支持自定义缓存键。被装饰的函数带有 `cache_invalidate(match=None)` 方法用于删除缓存项，
+    以及 `cache_pop(*keys)` 方法用于按键删除缓存项。
     """
     if key_fn is None:
         key_fn = lambda *args, **_: args
@@ -22,6 +38,8 @@ def cache(key_fn=None):
             cached_dct[key] = value
             return value
 
+        wrapper.cache_invalidate = lambda match=None: _invalidate(cached_dct, match)
+        wrapper.cache_pop = lambda *keys: _pop(cached_dct, keys)
         return wrapper
 
     return decorator
@@ -35,11 +53,14 @@ def cache_async(key_fn=None):
         key_fn = lambda *args, **_: args
 
     def decorator(func):
+        import inspect
+
         cached_dct = {}
+        key_is_async = inspect.iscoroutinefunction(key_fn)
 
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if inspect.iscoroutinefunction(key_fn):
+            if key_is_async:
                 key = await key_fn(*args, **kwargs)
             else:
                 key = key_fn(*args, **kwargs)
@@ -49,6 +70,8 @@ def cache_async(key_fn=None):
             cached_dct[key] = value
             return value
 
+        wrapper.cache_invalidate = lambda match=None: _invalidate(cached_dct, match)
+        wrapper.cache_pop = lambda *keys: _pop(cached_dct, keys)
         return wrapper
 
     return decorator
@@ -78,6 +101,8 @@ def ttl_cache(ttl: float, key_fn=None):
             cached_dct[key] = (value, current_time)
             return value
 
+        wrapper.cache_invalidate = lambda match=None: _invalidate(cached_dct, match)
+        wrapper.cache_pop = lambda *keys: _pop(cached_dct, keys)
         return wrapper
 
     return decorator
@@ -91,11 +116,14 @@ def ttl_cache_async(ttl: float, key_fn=None):
         key_fn = lambda *args, **_: args
 
     def decorator(func):
+        import inspect
+
         cached_dct = {}
+        key_is_async = inspect.iscoroutinefunction(key_fn)
 
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if inspect.iscoroutinefunction(key_fn):
+            if key_is_async:
                 key = await key_fn(*args, **kwargs)
             else:
                 key = key_fn(*args, **kwargs)
@@ -110,6 +138,8 @@ def ttl_cache_async(ttl: float, key_fn=None):
             cached_dct[key] = (value, current_time)
             return value
 
+        wrapper.cache_invalidate = lambda match=None: _invalidate(cached_dct, match)
+        wrapper.cache_pop = lambda *keys: _pop(cached_dct, keys)
         return wrapper
 
     return decorator
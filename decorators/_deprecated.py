@@ -1,7 +1,11 @@
 import os
-import inspect
+import sys
+import time
 import functools
+from types import CodeType
+from typing import Callable, Dict, List, Optional, Tuple
 from zex.log import logger
+from zex.types import Record
 
 
 def get_frame(stacklevel: int):
@@ -10,10 +14,10 @@ def get_frame(stacklevel: int):
     - `stacklevel`: 相对调用的位置
     """
     if stacklevel == 1:
-        return inspect.currentframe().f_back.f_back
+        return sys._getframe(2)
     elif stacklevel == 2:
-        return inspect.currentframe().f_back.f_back.f_back
-    frame = inspect.currentframe().f_back
+        return sys._getframe(3)
+    frame = sys._getframe(1)
     for _ in range(stacklevel):
         frame = frame.f_back
     return frame
@@ -28,19 +32,44 @@ def get_call_info(stacklevel: int):
     return filename, lineno
 
 
-def deprecated(message=None):
+# 被弃用的函数及其调用点：[(func, { (id(code object), f_lasti): [调用次数, 上次警告时间, code object, lineno] })]
+# code object 的哈希需要计算字节码和常量，f_lineno 需要解码行号表，因此调用点按 id 和指令偏移记录，
+# 值中保留 code object 使其 id 不会被复用
+_registry: List[Tuple[Callable, Dict[Tuple[int, int], list]]] = []
+
+
+def deprecated(message=None, interval: Optional[float] = None):
+    """
+    调用被装饰的函数时输出弃用警告。调用点按 `(code object, 指令偏移)` 记录，
+    默认每个调用点只警告一次，之后的调用只累加计数；`interval` 为秒数时，同一调用点至少间隔 `interval` 秒再次警告。
+    调用次数可以通过 `deprecation_report()` 查看。
+    """
 
     if message is None:
         message = lambda name, **_: f"'{name}' is deprecated and will be removed in future versions."
 
     def decorator(func):
+        callsites: Dict[Tuple[int, int], list] = {}
+        _registry.append((func, callsites))
+
+        def warn(code: CodeType, lineno: int):
+            filename = os.path.relpath(code.co_filename, os.getcwd())
+            msg = message(name=func.__name__, func=func)
+            logger.warning(f"{filename}:{lineno} {msg}")
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            filename, lineno = get_call_info(1)
-            msg = message(name=func.__name__, func=func)
-            msg = f"{filename}:{lineno} {msg}"
-            logger.warning(msg)
+            frame = sys._getframe(1)
+            key = (id(frame.f_code), frame.f_lasti)
+            site = callsites.get(key)
+            if site is None:
+                callsites[key] = site = [1, time.monotonic(), frame.f_code, frame.f_lineno]
+                warn(site[2], site[3])
+            else:
+                site[0] += 1
+                if interval is not None and time.monotonic() - site[1] >= interval:
+                    site[1] = time.monotonic()
+                    warn(site[2], site[3])
             return func(*args, **kwargs)
 
         return wrapper
@@ -48,4 +77,27 @@ def deprecated(message=None):
     return decorator
 
 
-__all__ = ["deprecated"]
+def deprecation_report(reset=False) -> List[Record]:
+    """
+    被弃用函数在各个调用点的调用次数，按次数降序排列：
+    `[{"name", "filename", "lineno", "caller", "count"}, ...]`。`reset` 为 True 时清空计数
+    """
+    rows = []
+    for func, callsites in _registry:
+        for count, _, code, lineno in list(callsites.values()):
+            rows.append(
+                {
+                    "name": f"{func.__module__}.{func.__qualname__}",
+                    "filename": code.co_filename,
+                    "lineno": lineno,
+                    "caller": code.co_name,
+                    "count": count,
+                }
+            )
+        if reset:
+            callsites.clear()
+    rows.sort(key=lambda d: d["count"], reverse=True)
+    return rows
+
+
+__all__ = ["deprecated", "deprecation_report"]
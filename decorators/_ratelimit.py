@@ -0,0 +1,267 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from functools import wraps
+from typing import Callable, Hashable, Optional
+
+_clock = time.monotonic
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.3f}s")
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """
+    限流器基类，子类实现 `_take(n)`：获取 n 个配额，成功时返回 0，否则不占用配额并返回需要等待的秒数。
+    `lock` 为 None 时不加锁 (只在一个线程或事件循环中使用)。
+    """
+
+    __slots__ = ()
+    lock: Optional[threading.Lock]
+
+    def _take(self, n: int) -> float:
+        raise NotImplementedError
+
+    def reserve(self, n=1) -> float:
+        """尝试获取配额，成功时返回 0，否则返回需要等待的秒数"""
+        if self.lock is None:
+            return self._take(n)
+        with self.lock:
+            return self._take(n)
+
+    def try_acquire(self, n=1) -> bool:
+        return self.reserve(n) == 0
+
+    def acquire(self, n=1, timeout: Optional[float] = None) -> bool:
+        """阻塞直到获取配额，超过 `timeout` 秒时返回 False"""
+        deadline = None if timeout is None else _clock() + timeout
+        while (delay := self.reserve(n)) > 0:
+            if deadline is not None and _clock() + delay > deadline:
+                return False
+            time.sleep(delay)
+        return True
+
+    async def acquire_async(self, n=1, timeout: Optional[float] = None) -> bool:
+        """`acquire` 的异步版本，通过 `asyncio.sleep` 等待，不阻塞事件循环"""
+        import asyncio
+
+        deadline = None if timeout is None else _clock() + timeout
+        while (delay := self.reserve(n)) > 0:
+            if deadline is not None and _clock() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+        return True
+
+
+class TokenBucket(Limiter):
+    """
+    令牌桶：最多积累 `capacity` 个令牌 (默认为 `max(rate, 1)`)，每秒补充 `rate` 个，允许突发 `capacity` 次调用。
+    - `threadsafe`: 只在一个线程或事件循环中使用时可以设为 False，省去加锁
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "lock")
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, threadsafe=True) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = _clock()
+        self.lock = threading.Lock() if threadsafe else None
+
+    def _take(self, n: int) -> float:
+        if n > self.capacity:
+            raise ValueError(f"Cannot acquire {n} tokens from a bucket of capacity {self.capacity}")
+        now = _clock()
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens >= n:
+            self.tokens = tokens - n
+            return 0.0
+        self.tokens = tokens
+        return (n - tokens) / self.rate
+
+
+class SlidingWindow(Limiter):
+    """
+    滑动窗口：任意 `window` 秒内最多 `limit` 次调用。记录最近的调用时间，内存占用不超过 `limit`。
+    - `threadsafe`: 同 `TokenBucket`
+    """
+
+    __slots__ = ("limit", "window", "hits", "lock")
+
+    def __init__(self, limit: int, window: float, threadsafe=True) -> None:
+        self.limit = limit
+        self.window = window
+        self.hits = deque()
+        self.lock = threading.Lock() if threadsafe else None
+
+    def _take(self, n: int) -> float:
+        if n > self.limit:
+            raise ValueError(f"Cannot acquire {n} calls from a window of limit {self.limit}")
+        now = _clock()
+        start = now - self.window
+        hits = self.hits
+        while hits and hits[0] <= start:
+            hits.popleft()
+        if len(hits) + n <= self.limit:
+            hits.extend([now] * n)
+            return 0.0
+        # 等待最早的若干次调用移出窗口
+        return hits[len(hits) + n - self.limit - 1] - start
+
+
+class KeyedLimiter:
+    """
+    每个键 (例如 userId) 使用一个由 `factory()` 创建的限流器，最多保留 `maxsize` 个，超出时淘汰最久未使用的键。
+    已有的键不需要加锁；被淘汰的键再次出现时重新计数，`maxsize` 应大于同时活跃的键数。
+    """
+
+    def __init__(self, factory: Callable[[], Limiter], maxsize=10000) -> None:
+        self.factory = factory
+        self.maxsize = maxsize
+        self.limiters: "OrderedDict[Hashable, Limiter]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.limiters)
+
+    def get(self, key: Hashable) -> Limiter:
+        limiter = self.limiters.get(key)
+        if limiter is not None:
+            try:
+                self.limiters.move_to_end(key)
+            except KeyError:
+                pass  # 刚刚被其他线程淘汰
+            return limiter
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = self.limiters[key] = self.factory()
+                while len(self.limiters) > self.maxsize:
+                    self.limiters.popitem(last=False)
+            return limiter
+
+    def reserve(self, key: Hashable, n=1) -> float:
+        return self.get(key).reserve(n)
+
+    def try_acquire(self, key: Hashable, n=1) -> bool:
+        return self.get(key).try_acquire(n)
+
+    def acquire(self, key: Hashable, n=1, timeout: Optional[float] = None) -> bool:
+        return self.get(key).acquire(n, timeout)
+
+    async def acquire_async(self, key: Hashable, n=1, timeout: Optional[float] = None) -> bool:
+        return await self.get(key).acquire_async(n, timeout)
+
+
+def rate_limit(factory: Callable[[], Limiter], key: Optional[Callable] = None, block=False, drop=False, maxsize=10000):
+    """
+    限制函数或协程函数的调用频率，`factory()` 创建限流器，例如 `lambda: TokenBucket(rate=5, capacity=10)`。
+    - `key`: 由调用参数计算限流键 (`key(*args, **kwargs)`，例如 userId)，每个键使用单独的限流器，最多 `maxsize` 个
+    - `block`: 等待配额后再调用，协程函数通过 `asyncio.sleep` 等待，不阻塞事件循环
+    - `drop`: 不等待时超限的调用直接返回 None，否则抛出 `RateLimitExceeded`
+    被装饰的函数带有 `limiter` 属性 (`Limiter` 或 `KeyedLimiter`)。
+    """
+
+    def decorator(func):
+        import inspect
+
+        if key:
+            limiter = KeyedLimiter(factory, maxsize)
+            get = lambda *args, **kwargs: limiter.get(key(*args, **kwargs))
+        else:
+            limiter = factory()
+            get = lambda *_, **__: limiter
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                lim = get(*args, **kwargs)
+                if block:
+                    await lim.acquire_async()
+                elif (delay := lim.reserve()) > 0:
+                    if drop:
+                        return None
+                    raise RateLimitExceeded(delay)
+                return await func(*args, **kwargs)
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                lim = get(*args, **kwargs)
+                if block:
+                    lim.acquire()
+                elif (delay := lim.reserve()) > 0:
+                    if drop:
+                        return None
+                    raise RateLimitExceeded(delay)
+                return func(*args, **kwargs)
+
+        wrapper.limiter = limiter
+        return wrapper
+
+    return decorator
+
+
+def debounce(wait: float):
+    """
+    连续调用时只在最后一次调用 `wait` 秒后执行一次，使用最后一次调用的参数，调用本身返回 None。
+    普通函数在一个后台线程中执行 (等待期间的调用只更新参数和截止时间)，协程函数在当前事件循环中执行。
+    """
+
+    def decorator(func):
+        import inspect
+
+        if inspect.iscoroutinefunction(func):
+            import asyncio
+
+            state = {"handle": None, "tasks": set()}
+
+            def fire(args, kwargs):
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                state["tasks"].add(task)
+                task.add_done_callback(state["tasks"].discard)
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if state["handle"] is not None:
+                    state["handle"].cancel()
+                state["handle"] = asyncio.get_running_loop().call_later(wait, fire, args, kwargs)
+
+            return wrapper
+
+        cond = threading.Condition()
+        state = {"pending": None, "deadline": 0.0, "thread": None}
+
+        def worker():
+            while True:
+                with cond:
+                    remaining = state["deadline"] - _clock()
+                    if remaining > 0:
+                        cond.wait(remaining)
+                        continue
+                    args, kwargs = state["pending"]
+                    state["pending"] = state["thread"] = None
+                func(*args, **kwargs)
+                return
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with cond:
+                state["pending"] = (args, kwargs)
+                state["deadline"] = _clock() + wait
+                if state["thread"] is None:
+                    state["thread"] = threading.Thread(target=worker, daemon=True)
+                    state["thread"].start()
+
+        return wrapper
+
+    return decorator
+
+
+__all__ = ["Limiter", "TokenBucket", "SlidingWindow", "KeyedLimiter", "RateLimitExceeded", "rate_limit", "debounce"]
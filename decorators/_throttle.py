@@ -1,23 +1,72 @@
-import time
 import threading
+from functools import wraps
+from ._ratelimit import TokenBucket
 
 
-def throttle(interval: int):
+def throttle(interval: float, trailing=False):
     """
-    限制一个函数在一定时间内只能被调用一次，防止其被过于频繁地调用。
+    限制一个函数在一定时间内只能被调用一次，防止其被过于频繁地调用。间隔内的调用不执行，返回 None。
+    - `trailing`: 间隔内被忽略的最后一次调用在间隔结束后执行 (普通函数在定时器线程中执行，协程函数在当前事件循环中执行)
+    支持协程函数。`interval <= 0` 时不限制，直接返回原函数。
     """
 
     def decorator(func):
+        if interval <= 0:
+            return func
 
-        last_time_called = [0]  # 使用列表以便在嵌套函数中修改
+        import inspect
+
+        bucket = TokenBucket(1 / interval, capacity=1)
+        state = {"pending": None, "timer": None}
         lock = threading.Lock()
 
-        def wrapper(*args, **kwargs):
+        if inspect.iscoroutinefunction(func):
+            import asyncio
+
+            async def fire_later(delay):
+                while True:
+                    await asyncio.sleep(delay)
+                    if (delay := bucket.reserve()) == 0:
+                        break
+                args, kwargs = state["pending"]
+                state["pending"] = state["timer"] = None
+                await func(*args, **kwargs)
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if (delay := bucket.reserve()) == 0:
+                    return await func(*args, **kwargs)
+                if trailing:
+                    state["pending"] = (args, kwargs)
+                    if state["timer"] is None:
+                        state["timer"] = asyncio.ensure_future(fire_later(delay))
+
+            return wrapper
+
+        def fire():
+            if (delay := bucket.reserve()) > 0:
+                # 定时器到期前又有调用取得了令牌
+                with lock:
+                    state["timer"] = threading.Timer(delay, fire)
+                    state["timer"].daemon = True
+                    state["timer"].start()
+                return
             with lock:
-                current_time = time.time()
-                if current_time - last_time_called[0] >= interval:
-                    last_time_called[0] = current_time
-                    return func(*args, **kwargs)
+                args, kwargs = state["pending"]
+                state["pending"] = state["timer"] = None
+            func(*args, **kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if (delay := bucket.reserve()) == 0:
+                return func(*args, **kwargs)
+            if trailing:
+                with lock:
+                    state["pending"] = (args, kwargs)
+                    if state["timer"] is None:
+                        state["timer"] = threading.Timer(delay, fire)
+                        state["timer"].daemon = True
+                        state["timer"].start()
 
         return wrapper
 
@@ -1,9 +1,14 @@
 import os
 import re
+import stat as _stat
 import shutil
+import threading
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
 from os.path import *
 from os.path import __all__ as __os_path__
-from typing import Sequence
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 __all__ = [
     *__os_path__,
@@ -21,6 +26,20 @@ __all__ = [
     "move",
     "copy_dir",
     "copy_file",
+    "copy_file_fast",
+    "clone_file",
+    "copy_dir_async",
+    "copy_file_async",
+    "CopyProgress",
+    "getstat",
+    "stat_scope",
+    "stat_many",
+    "StatArrays",
+    "FT_MISSING",
+    "FT_FILE",
+    "FT_DIR",
+    "FT_LINK",
+    "FT_OTHER",
     "rename",
     "rmfiles",
     "list_files",
@@ -78,8 +97,358 @@ make_slink = os.symlink
 make_hlink = os.link
 listdir = os.listdir
 move = shutil.move
-copy_dir = shutil.copytree
-copy_file = shutil.copy
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+def clone_file(src: str, dst: str) -> bool:
+    """尝试通过 reflink (FICLONE) 克隆文件，文件系统不支持时返回 False 并且不创建 dst"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fr:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            fcntl.ioctl(fd, FICLONE, fr.fileno())
+            return True
+        except OSError:
+            os.close(fd)
+            fd = None
+            os.remove(dst)
+            return False
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+def _copy_content(src: str, dst: str):
+    """在内核中复制文件内容：copy_file_range > sendfile > 用户空间缓冲区"""
+    with open(src, "rb") as fr, open(dst, "wb") as fw:
+        ifd, ofd = fr.fileno(), fw.fileno()
+        size = os.fstat(ifd).st_size
+        for name in ("copy_file_range", "sendfile"):
+            fn = getattr(os, name, None)
+            if fn is None:
+                continue
+            offset = 0
+            try:
+                while offset < size:
+                    if name == "sendfile":
+                        n = fn(ofd, ifd, offset, size - offset)
+                    else:
+                        n = fn(ifd, ofd, size - offset, offset, offset)
+                    if n == 0:
+                        break
+                    offset += n
+                if offset >= size:
+                    return
+            except OSError:
+                pass
+            fr.seek(0)
+            fw.seek(0)
+            fw.truncate()
+        shutil.copyfileobj(fr, fw, 1 << 20)
+
+
+def _copy_to(src: str, dst: str, reflink: bool):
+    """
+    复制文件内容到 `dst`，与 `shutil.copyfile` 一样会写入符号链接指向的文件和硬链接共享的 inode：
+    - `src` 与 `dst` 为同一文件时抛出 `shutil.SameFileError`
+    - `dst` 有其他硬链接时就地覆盖写入
+    - 其他情况写入同一目录下的临时文件后通过 `os.replace` 替换，复制失败时不会破坏原有的 `dst`
+    """
+    try:
+        dst_st = os.stat(dst)
+    except (FileNotFoundError, NotADirectoryError):
+        dst_st = None
+    if dst_st is not None and os.path.samestat(os.stat(src), dst_st):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    if dst_st is not None and dst_st.st_nlink > 1:
+        _copy_content(src, dst)
+        return
+    target = os.path.realpath(dst)
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.copying"
+    try:
+        if not (reflink and clone_file(src, tmp)):
+            _copy_content(src, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def copy_file_fast(src: str, dst: str, reflink=True):
+    """复制文件内容和元数据 (同 `shutil.copy2`)，优先使用 reflink，其次在内核中复制"""
+    _copy_to(src, dst, reflink)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def copy_file(src: str, dst: str):
+    """同 `shutil.copy`：`dst` 为目录时复制到该目录下，只复制文件权限"""
+    if isdir(dst):
+        dst = join(dst, basename(src))
+    _copy_to(src, dst, reflink=True)
+    shutil.copymode(src, dst)
+    return dst
+
+
+class CopyProgress:
+    """目录复制进度，`*_total` 在扫描过程中逐渐增大，`scanned` 为 True 时才是最终值"""
+
+    def __init__(self) -> None:
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_skipped = 0
+        self.scanned = False
+        self._lock = threading.Lock()
+
+    def _done(self, size: int, skipped=False):
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += size
+            if skipped:
+                self.files_skipped += 1
+
+
+def copy_dir(
+    src: str,
+    dst: str,
+    symlinks=False,
+    ignore: Callable[[str, List[str]], Iterable[str]] = None,
+    copy_function: Callable[[str, str], Any] = None,
+    ignore_dangling_symlinks=False,
+    dirs_exist_ok=False,
+    *,
+    workers=8,
+    progress: Callable[[CopyProgress], None] = None,
+    resume=False,
+    reflink=True,
+):
+    """
+    并行复制目录，参数和行为与 `shutil.copytree` 一致 (默认跟随符号链接，复制文件元数据，错误汇总为 `shutil.Error`)。
+    - `copy_function`: 复制文件的函数，默认为支持 reflink 的 `copy_file_fast` (同 `shutil.copy2`)
+    - `workers`: 复制文件的线程数
+    - `progress`: 每处理完一个文件 (包括 `resume` 跳过的文件) 后调用，参数为 `CopyProgress`；其中的异常会中止复制并抛出
+    - `resume`: 跳过目标中大小和修改时间都与源文件一致的文件，用于中断后继续复制 (隐含 `dirs_exist_ok=True`)
+    - `reflink`: 文件系统支持时使用 reflink 克隆文件 (仅默认的 `copy_function`)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if exists(dst) and not (dirs_exist_ok or resume):
+        raise FileExistsError(dst)
+
+    state = CopyProgress()
+    errors = []
+    fatal: List[BaseException] = []
+
+    def copy_content(s: str, d: str, st: os.stat_result):
+        if resume:
+            try:
+                dst_st = os.stat(d)
+                if dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns:
+                    state._done(st.st_size, skipped=True)
+                    return
+            except FileNotFoundError:
+                pass
+        try:
+            if copy_function is None:
+                copy_file_fast(s, d, reflink=reflink)
+            else:
+                copy_function(s, d)
+            state._done(st.st_size)
+        except OSError as e:
+            errors.append((s, d, str(e)))
+            state._done(0)
+
+    def copy_one(s: str, d: str, st: os.stat_result):
+        # 线程中的其他异常 (包括 progress 回调中的异常) 记录下来，在主线程中抛出
+        try:
+            copy_content(s, d, st)
+            if progress:
+                progress(state)
+        except BaseException as e:
+            fatal.append(e)
+
+    dirs = []
+    with ThreadPoolExecutor(workers) as pool:
+        stack = [(src, dst)]
+        while stack and not fatal:
+            s_dir, d_dir = stack.pop()
+            os.makedirs(d_dir, exist_ok=True)
+            dirs.append((s_dir, d_dir))
+            with os.scandir(s_dir) as it:
+                entries = list(it)
+            ignored = set(ignore(s_dir, [e.name for e in entries])) if ignore else ()
+            for entry in entries:
+                if entry.name in ignored:
+                    continue
+                d = join(d_dir, entry.name)
+                try:
+                    if symlinks and entry.is_symlink():
+                        os.symlink(os.readlink(entry.path), d)
+                        shutil.copystat(entry.path, d, follow_symlinks=False)
+                        continue
+                    if entry.is_dir():
+                        stack.append((entry.path, d))
+                        continue
+                    st = entry.stat()
+                except OSError as e:
+                    # 悬空的符号链接 (`symlinks=False` 时无法 stat)
+                    if not (ignore_dangling_symlinks and entry.is_symlink() and not os.path.exists(entry.path)):
+                        errors.append((entry.path, d, str(e)))
+                    continue
+                with state._lock:
+                    state.files_total += 1
+                    state.bytes_total += st.st_size
+                pool.submit(copy_one, entry.path, d, st)
+        state.scanned = True
+    if fatal:
+        raise fatal[0]
+
+    for s_dir, d_dir in reversed(dirs):
+        try:
+            shutil.copystat(s_dir, d_dir)
+        except OSError as e:
+            errors.append((s_dir, d_dir, str(e)))
+    if errors:
+        raise shutil.Error(errors)
+    return dst
+
+
+async def copy_dir_async(src: str, dst: str, **kwargs):
+    """在线程中执行 `copy_dir`，不阻塞事件循环"""
+    import asyncio
+
+    return await asyncio.to_thread(copy_dir, src, dst, **kwargs)
+
+
+async def copy_file_async(src: str, dst: str):
+    import asyncio
+
+    return await asyncio.to_thread(copy_file, src, dst)
+
+
+_stat_memo: ContextVar[Optional[Dict[Tuple[str, bool], Optional[os.stat_result]]]] = ContextVar("zex_fs_stat_memo", default=None)
+
+
+@contextmanager
+def stat_scope():
+    """
+    在上下文中记住 `getstat` / `stat_many` 的结果，同一路径只调用一次 stat，退出时丢弃。
+    只适用于只读的操作 (例如列出目录)，上下文中修改文件后不会看到新的状态
+    """
+    token = _stat_memo.set({})
+    try:
+        yield
+    finally:
+        _stat_memo.reset(token)
+
+
+def _stat_or_none(path: str, follow_symlinks: bool):
+    try:
+        return os.stat(path, follow_symlinks=follow_symlinks)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def getstat(path: str, follow_symlinks=True) -> Optional[os.stat_result]:
+    """同 `os.stat`，路径不存在时返回 None；在 `stat_scope` 中会记住结果"""
+    memo = _stat_memo.get()
+    if memo is None:
+        return _stat_or_none(path, follow_symlinks)
+    key = (path, follow_symlinks)
+    if key not in memo:
+        memo[key] = _stat_or_none(path, follow_symlinks)
+    return memo[key]
+
+
+FT_MISSING = 0
+FT_FILE = 1
+FT_DIR = 2
+FT_LINK = 3
+FT_OTHER = 4
+
+
+def _ftype(mode: int):
+    if _stat.S_ISREG(mode):
+        return FT_FILE
+    if _stat.S_ISDIR(mode):
+        return FT_DIR
+    if _stat.S_ISLNK(mode):
+        return FT_LINK
+    return FT_OTHER
+
+
+class StatArrays(NamedTuple):
+    """
+    `stat_many` 的结果，按列存储：`paths[i]` 对应每一列的第 i 项。
+    列为 `array('q')` (类型为 `array('b')`，取值 `FT_*`)，`numpy=True` 时为共享内存的 NumPy 数组。
+    不存在的路径类型为 `FT_MISSING`，其余列为 0
+    """
+
+    paths: Sequence[str]
+    size: Sequence[int]
+    mtime_ns: Sequence[int]
+    ctime_ns: Sequence[int]
+    mode: Sequence[int]
+    type: Sequence[int]
+
+    def __len__(self):
+        return len(self.paths)
+
+
+def stat_many(paths: Sequence[str], follow_symlinks=True, workers=8, numpy=False) -> StatArrays:
+    """
+    批量获取路径的 stat 信息，路径较多时在线程池中并行调用 (stat 会释放 GIL)。
+    在 `stat_scope` 中会复用并记住结果，之后的 `getstat` 不再调用系统调用
+    """
+    paths = list(paths)
+    memo = _stat_memo.get()
+    results: list = [None] * len(paths)
+    pending = []
+    for i, p in enumerate(paths):
+        if memo is not None and (p, follow_symlinks) in memo:
+            results[i] = memo[(p, follow_symlinks)]
+        else:
+            pending.append(i)
+
+    def run(indexes: Sequence[int]):
+        for i in indexes:
+            results[i] = _stat_or_none(paths[i], follow_symlinks)
+
+    if len(pending) < 256 or workers <= 1:
+        run(pending)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        step = -(-len(pending) // workers)
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(run, [pending[i : i + step] for i in range(0, len(pending), step)]))
+    if memo is not None:
+        for i in pending:
+            memo[(paths[i], follow_symlinks)] = results[i]
+
+    n = len(paths)
+    size, mtime, ctime, mode = (array("q", bytes(8 * n)) for _ in range(4))
+    ftype = array("b", bytes(n))
+    for i, st in enumerate(results):
+        if st is not None:
+            size[i] = st.st_size
+            mtime[i] = st.st_mtime_ns
+            ctime[i] = st.st_ctime_ns
+            mode[i] = st.st_mode
+            ftype[i] = _ftype(st.st_mode)
+    cols = (size, mtime, ctime, mode, ftype)
+    if numpy:
+        import numpy as np
+
+        cols = tuple(np.frombuffer(c, dtype=np.int64 if c.typecode == "q" else np.int8) for c in cols)
+    return StatArrays(paths, *cols)
 
 
 def clear_dir(dp: str):
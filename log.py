@@ -3,12 +3,15 @@ import sys
 
 
 def get_default_logger():
+    """
+    loguru 可用时按 `ZEX_LOG_LEVEL` (默认为 INFO) 将 zex 自身的日志输出到 stdout，
+    只添加这一个 handler，不删除应用已有的 handler。否则使用 `logging.basicConfig` (root logger 已有 handler 时不生效)
+    """
     level = os.environ.get("ZEX_LOG_LEVEL", "INFO")
     try:
         from loguru import logger
 
-        logger.remove()
-        logger.add(sys.stdout, level=level)
+        logger.add(sys.stdout, level=level, filter=__package__)
     except ImportError:
         import logging as logger
 
@@ -20,4 +23,21 @@ def get_default_logger():
     return logger
 
 
-logger = get_default_logger()
+class LazyLogger:
+    """第一次访问属性时才调用 `get_default_logger()` 配置日志，仅导入 zex 时不会导入 loguru/logging"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self) -> None:
+        self._logger = None
+
+    def __getattr__(self, name: str):
+        if self._logger is None:
+            self._logger = get_default_logger()
+        return getattr(self._logger, name)
+
+    def __repr__(self) -> str:
+        return f"LazyLogger({self._logger!r})"
+
+
+logger = LazyLogger()
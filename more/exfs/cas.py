@@ -0,0 +1,204 @@
+# 内容寻址存储：相同内容的上传文件只保存一份
+import os
+import uuid
+import hashlib
+import shutil
+from typing import ClassVar, Dict, List, Optional
+from zex import fs, xio
+
+CHUNK_SIZE = 1 << 20
+
+K_AUTO = "auto"
+K_HARDLINK = "hardlink"
+K_REFLINK = "reflink"
+
+
+class ContentStore:
+    """
+    内容寻址存储，对象保存在 `{store_dir}/objects/{digest[:2]}/{digest[2:4]}/{digest}`。
+    两级分片目录就是磁盘上的哈希表：查找一个摘要只需要一次 stat，与对象数量无关，
+    每个分片目录在数百万个对象时也只有几十个条目。
+
+    存储只在能够共享数据块时使用，用户文件通过 `link` 指向对象：
+    - "auto" (默认): reflink (写时复制，需要 btrfs/xfs 等文件系统支持)，用户文件与对象互不影响。
+      文件系统不支持 reflink 时 (ext4 等) 跳过存储，上传的文件直接重命名为正式文件，不占用额外空间
+    - "hardlink": 需要显式启用。所有上传相同内容的用户文件与对象共享同一个 inode，
+      就地写入一个用户文件时会同时修改对象和其他用户的文件，只适用于用户文件不可原地修改的部署
+
+    reflink 方式下每次链接都记录在 `{store_dir}/refs/{digest[:2]}/{digest[2:4]}/{digest}.jsonl` 中
+    (路径、inode、大小和修改时间)，`gc()` 据此判断对象是否仍被引用。
+
+    `algorithm` 为对象的键，默认为 sha256。客户端提供的摘要只说明客户端知道摘要，不能证明其拥有文件内容，
+    秒传 (`materialize`) 只应该用于允许该用户访问此内容的场景。
+    """
+
+    instances: ClassVar[Dict[str, "ContentStore"]] = {}
+
+    def __init__(self, store_dir: str, algorithm="sha256", link=K_AUTO) -> None:
+        if link not in (K_AUTO, K_HARDLINK):
+            raise ValueError(f"Invalid link: {link}")
+        self.store_dir = fs.mkdir(fs.abspath(store_dir))
+        self.objects_dir = fs.mkdir(fs.join(self.store_dir, "objects"))
+        self.refs_dir = fs.mkdir(fs.join(self.store_dir, "refs"))
+        self.algorithm = algorithm
+        self.link = link
+
+    @classmethod
+    def of(cls, store_dir: str, **kwargs) -> "ContentStore":
+        key = fs.abspath(store_dir)
+        if key not in cls.instances:
+            cls.instances[key] = cls(key, **kwargs)
+        return cls.instances[key]
+
+    def object_path(self, digest: str) -> str:
+        digest = digest.lower()
+        return fs.join(self.objects_dir, digest[:2], digest[2:4], digest)
+
+    def refs_path(self, digest: str) -> str:
+        digest = digest.lower()
+        return fs.join(self.refs_dir, digest[:2], digest[2:4], f"{digest}.jsonl")
+
+    def has(self, digest: str) -> bool:
+        return os.path.isfile(self.object_path(digest))
+
+    def digest_file(self, path: str) -> str:
+        h = hashlib.new(self.algorithm)
+        with open(path, "rb") as f:
+            buf = bytearray(CHUNK_SIZE)
+            view = memoryview(buf)
+            while n := f.readinto(buf):
+                h.update(view[:n])
+        return h.hexdigest()
+
+    @staticmethod
+    def _stamp(path: str):
+        st = os.stat(path)
+        return {"path": path, "ino": st.st_ino, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _add_ref(self, digest: str, path: str):
+        if self.link == K_HARDLINK:
+            return  # 硬链接以 st_nlink 计数
+        fp = self.refs_path(digest)
+        fs.mkdir(fs.dirname(fp))
+        with open(fp, "ab") as fw:
+            fw.write(xio.json_dumpb(self._stamp(fs.abspath(path))) + b"\n")
+
+    def _read_refs(self, digest: str) -> List[dict]:
+        try:
+            with open(self.refs_path(digest), "rb") as fr:
+                return [xio.json_loads(line) for line in fr if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _ref_alive(self, ref: dict) -> bool:
+        """路径仍然存在且自链接以来没有被替换或修改"""
+        try:
+            return self._stamp(ref["path"]) == ref
+        except FileNotFoundError:
+            return False
+
+    def _link_to(self, obj: str, dst: str) -> Optional[str]:
+        """将对象原子地链接到 `dst` (已存在时替换)，返回链接方式；不能共享数据块时不创建 `dst` 并返回 None"""
+        tmp = f"{dst}.{uuid.uuid4().hex[:8]}.cas"
+        try:
+            if self.link == K_HARDLINK:
+                os.link(obj, tmp)
+                how = K_HARDLINK
+            elif fs.clone_file(obj, tmp):
+                how = K_REFLINK
+            else:
+                return None
+            os.replace(tmp, dst)
+            return how
+        finally:
+            fs.rmfiles(tmp)
+
+    def _insert(self, path: str, digest: str) -> bool:
+        """
+        将文件加入存储：hardlink 方式下对象与 `path` 共享 inode，否则 reflink 为独立的只读对象，不修改 `path` 本身。
+        不能共享数据块 (不支持 reflink) 或对象已存在 (并发写入) 时返回 False
+        """
+        obj = self.object_path(digest)
+        fs.mkdir(fs.dirname(obj))
+        tmp = f"{obj}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            if self.link == K_HARDLINK:
+                os.link(path, tmp)
+            elif fs.clone_file(path, tmp):
+                os.chmod(tmp, 0o444)
+            else:
+                return False
+            if self.has(digest):
+                return False
+            os.replace(tmp, obj)
+            return True
+        finally:
+            fs.rmfiles(tmp)
+
+    def commit(self, temp_path: str, dst_path: str, digest: Optional[str] = None) -> str:
+        """
+        上传完成后调用：内容已存在时删除 `temp_path` 并将 `dst_path` 链接到已有对象，
+        否则将 `temp_path` 重命名为 `dst_path` 并加入存储 (不能共享数据块时只重命名)。返回内容摘要
+        """
+        digest = (digest or self.digest_file(temp_path)).lower()
+        obj = self.object_path(digest)
+        if self.has(digest):
+            if self._link_to(obj, dst_path):
+                fs.rmfiles(temp_path)
+                self._add_ref(digest, dst_path)
+            else:
+                os.replace(temp_path, dst_path)
+            return digest
+        os.replace(temp_path, dst_path)
+        # 并发写入时对象已由其他上传创建，改为链接到该对象
+        if self._insert(dst_path, digest) or (self.has(digest) and self._link_to(obj, dst_path)):
+            self._add_ref(digest, dst_path)
+        return digest
+
+    def materialize(self, digest: str, dst_path: str) -> bool:
+        """
+        客户端预先提供摘要时调用：对象存在则直接创建 `dst_path` 并返回 True，客户端无需上传。
+        不能共享数据块时复制对象，与客户端上传一次占用的空间相同
+        """
+        obj = self.object_path(digest)
+        if not os.path.isfile(obj):
+            return False
+        fs.mkdir(fs.dirname(dst_path))
+        if not self._link_to(obj, dst_path):
+            tmp = f"{dst_path}.{uuid.uuid4().hex[:8]}.cas"
+            try:
+                shutil.copyfile(obj, tmp)
+                os.replace(tmp, dst_path)
+            finally:
+                fs.rmfiles(tmp)
+            return True
+        self._add_ref(digest, dst_path)
+        return True
+
+    def gc(self) -> int:
+        """
+        删除不再被引用的对象，返回删除的对象数。不应与 `commit` / `materialize` 并发执行。
+        - hardlink: 没有其他硬链接 (st_nlink == 1) 的对象
+        - auto: 所有引用的路径都已删除、被替换或被修改的对象；仍然有效的引用会被重写，清除失效的记录
+        """
+        removed = 0
+        for shard1 in os.scandir(self.objects_dir):
+            for shard2 in os.scandir(shard1.path):
+                for entry in os.scandir(shard2.path):
+                    if entry.name.endswith(".tmp"):
+                        continue
+                    if self.link == K_HARDLINK:
+                        if entry.stat(follow_symlinks=False).st_nlink == 1:
+                            os.unlink(entry.path)
+                            removed += 1
+                        continue
+                    refs = self._read_refs(entry.name)
+                    alive = [r for r in refs if self._ref_alive(r)]
+                    if not alive:
+                        os.unlink(entry.path)
+                        fs.rmfiles(self.refs_path(entry.name))
+                        removed += 1
+                    elif len(alive) < len(refs):
+                        with xio.atomic_writer(self.refs_path(entry.name)) as fw:
+                            fw.write(b"".join(xio.json_dumpb(r) + b"\n" for r in alive))
+        return removed
@@ -1,4 +1,3 @@
-import json
 import hashlib
 from dataclasses import dataclass
 from typing import Optional, Tuple, Union
@@ -8,6 +7,9 @@ from zex.decorators import cache
 
 from .kdefs import *
 
+_pick_dumped = xdict.key_picker(FM_KEYS_DUMPED)
+_pick_hashed = xdict.key_picker(FM_KEYS_HASHED)
+
 
 class Chunk:
     def __init__(
@@ -30,8 +32,7 @@ class Chunk:
             raise Exception("Chunk meta is not found in mixed frame.")
         chunk_data = bytes_data[chunk_meta_size + 1 :]
         try:
-            chunk_meta_str = bytes_data[:chunk_meta_size].decode("utf-8")
-            chunk_meta = json.loads(chunk_meta_str)
+            chunk_meta = xio.json_loads(bytes_data[:chunk_meta_size])
         except Exception:
             raise Exception("Invalid chunk meta.")
         return chunk_data, chunk_meta
@@ -85,21 +86,19 @@ class FileMeta:
         self.extra = extra or {}
 
     def dumps(self) -> RoRecord:
-        return xdict.pick_keys(self.__dict__, FM_KEYS_DUMPED)
+        return _pick_dumped(self.__dict__)
 
     def json(self) -> RoRecord:
-        return xdict.pick_keys(self.__dict__, FM_KEYS_DUMPED)
+        return _pick_dumped(self.__dict__)
 
     def __hash__(self) -> int:
-        d = xdict.pick_keys(self.__dict__, FM_KEYS_HASHED)
-        fset = frozenset([(k, v) for k, v in d.items()])
-        return hash(fset)
+        return hash(frozenset(zip(FM_KEYS_HASHED, _pick_hashed.values(self.__dict__))))
 
     def breakpoint(self, filepath: str):
         """基于文件的大小推断断点恢复索引"""
-        if not fs.exists(filepath):
+        if (st := fs.getstat(filepath)) is None:
             return 0
-        size = fs.getsize(filepath)
+        size = st.st_size
         nf = size / self.chunkSize
         ni = int(nf)
         # 不是 chunkSize 的整数倍 & 不是最后一个 chunk
@@ -0,0 +1,237 @@
+# 用户目录的磁盘用量索引
+import os
+import time
+import atexit
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Dict, List, Optional, Tuple
+from zex import fs, xio
+
+Usage = Tuple[int, int]  # (字节数, 文件数)
+
+
+def _scan(path: str) -> Dict[str, List[int]]:
+    """自底向上遍历目录，返回 `{ 目录绝对路径: [字节数, 文件数] }`，数值包含所有子目录"""
+    totals: Dict[str, List[int]] = {}
+    for dp, dns, fns, dfd in os.fwalk(path, topdown=False):
+        nbytes, nfiles = 0, 0
+        for fn in fns:
+            try:
+                st = os.stat(fn, dir_fd=dfd, follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            nbytes += st.st_size
+            nfiles += 1
+        for dn in dns:
+            if sub := totals.get(os.path.join(dp, dn)):
+                nbytes += sub[0]
+                nfiles += sub[1]
+        totals[dp] = [nbytes, nfiles]
+    return totals
+
+
+class DuIndex:
+    """
+    用户目录的磁盘用量索引 `{ 相对目录: [字节数, 文件数] }`，数值包含所有子目录，`""` 表示用户目录本身。
+    `add_path` / `remove_path` / `move_path` 只更新受影响的目录及其祖先目录，`rescan` 并行重建整个索引。
+
+    索引保存在 `index_path` 中，`save(min_interval)` 限制写入频率，间隔内的修改由定时器在间隔结束后写入，
+    进程退出时写入所有未保存的修改。内存中的索引有未保存的修改时存在标记文件 `{index_path}.dirty`，
+    加载时发现标记文件 (进程在写入之前退出) 说明索引文件已过期，会重新遍历用户目录。
+    """
+
+    instances: ClassVar[Dict[str, "DuIndex"]] = {}
+    _alive: ClassVar["weakref.WeakSet[DuIndex]"] = weakref.WeakSet()
+
+    def __init__(self, root: str, index_path: str) -> None:
+        self.root = fs.normpath(fs.abspath(root))
+        self.index_path = index_path
+        self.dirty_path = index_path + ".dirty"
+        self.dirs: Dict[str, List[int]] = {}
+        self.lock = threading.RLock()
+        self.save_lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+        self.dirty = False
+        self.saved_at = 0.0
+        DuIndex._alive.add(self)
+        if not os.path.exists(self.dirty_path) and (data := xio.read_json(index_path)) is not None:
+            self.dirs = data
+        else:
+            self.rescan()
+
+    @classmethod
+    def of(cls, root: str, index_path: str) -> "DuIndex":
+        """每个索引文件只创建一个实例，多个实例各自保存会互相覆盖"""
+        key = fs.abspath(index_path)
+        if key not in cls.instances:
+            cls.instances[key] = cls(root, key)
+        return cls.instances[key]
+
+    def _mark_dirty(self):
+        """在持有 `self.lock` 时调用"""
+        if not self.dirty:
+            self.dirty = True
+            fs.mkdir(fs.dirname(self.dirty_path))
+            open(self.dirty_path, "wb").close()
+
+    def _rel(self, path: str) -> str:
+        rel = os.path.relpath(fs.normpath(fs.abspath(path)), self.root)
+        return "" if rel == "." else rel
+
+    @staticmethod
+    def _ancestors(rel_dir: str):
+        while rel_dir:
+            yield rel_dir
+            rel_dir = os.path.dirname(rel_dir)
+        yield ""
+
+    def _add_to_ancestors(self, rel_dir: str, nbytes: int, nfiles: int):
+        for a in self._ancestors(rel_dir):
+            entry = self.dirs.setdefault(a, [0, 0])
+            entry[0] += nbytes
+            entry[1] += nfiles
+
+    def _subtree_keys(self, rel: str):
+        prefix = rel + os.sep
+        return [k for k in self.dirs if k == rel or k.startswith(prefix)]
+
+    def get(self, path: str) -> Usage:
+        """目录的用量 (包含子目录)；文件返回其自身大小"""
+        rel = self._rel(path)
+        with self.lock:
+            if rel in self.dirs:
+                return tuple(self.dirs[rel])
+        if os.path.isfile(path):
+            return (os.path.getsize(path), 1)
+        return (0, 0)
+
+    def usage_of(self, path: str) -> Usage:
+        """在删除或移动之前获取路径的用量"""
+        if os.path.isdir(path) and not os.path.islink(path):
+            return self.get(path)
+        try:
+            return (os.lstat(path).st_size, 1)
+        except FileNotFoundError:
+            return (0, 0)
+
+    def add_path(self, path: str, replaced: Optional[Usage] = None):
+        """
+        路径被创建 (新建、复制、上传完成) 后调用。
+        `replaced` 为被覆盖的旧文件的用量 (操作之前通过 `usage_of` 获取)，会先从祖先目录中扣除
+        """
+        rel = self._rel(path)
+        if not rel:
+            return self.rescan()
+        if not os.path.isdir(path) or os.path.islink(path):
+            usage = self.usage_of(path)
+            with self.lock:
+                if replaced:
+                    self._add_to_ancestors(os.path.dirname(rel), -replaced[0], -replaced[1])
+                self._add_to_ancestors(os.path.dirname(rel), *usage)
+                self._mark_dirty()
+            return
+        top = fs.normpath(fs.abspath(path))
+        totals = _scan(top)
+        with self.lock:
+            # 覆盖已有目录时先扣除旧的用量
+            if old := self.dirs.get(rel):
+                self.remove_path(path, tuple(old))
+            for dp, usage in totals.items():
+                self.dirs[self._rel(dp)] = usage
+            self._add_to_ancestors(os.path.dirname(rel), *totals[top])
+            self._mark_dirty()
+
+    def remove_path(self, path: str, usage: Optional[Usage] = None):
+        """路径被删除后调用，`usage` 为删除前通过 `usage_of` 获取的用量"""
+        rel = self._rel(path)
+        with self.lock:
+            if usage is None:
+                usage = tuple(self.dirs.get(rel, (0, 0)))
+            for k in self._subtree_keys(rel):
+                del self.dirs[k]
+            self._add_to_ancestors(os.path.dirname(rel), -usage[0], -usage[1])
+            self._mark_dirty()
+
+    def move_path(self, old_path: str, new_path: str, usage: Optional[Usage] = None, replaced: Optional[Usage] = None):
+        """
+        路径被移动或重命名后调用，子目录的索引项随之改名，用量从旧的祖先目录转移到新的祖先目录。
+        `replaced` 同 `add_path`
+        """
+        old_rel, new_rel = self._rel(old_path), self._rel(new_path)
+        with self.lock:
+            if usage is None:
+                usage = tuple(self.dirs[old_rel]) if old_rel in self.dirs else self.usage_of(new_path)
+            moved = {}
+            for k in self._subtree_keys(old_rel):
+                moved[new_rel + k[len(old_rel) :]] = self.dirs.pop(k)
+            self._add_to_ancestors(os.path.dirname(old_rel), -usage[0], -usage[1])
+            if replaced:
+                self._add_to_ancestors(os.path.dirname(new_rel), -replaced[0], -replaced[1])
+            self.dirs.update(moved)
+            self._add_to_ancestors(os.path.dirname(new_rel), *usage)
+            self._mark_dirty()
+
+    def rescan(self, workers=8):
+        """并行遍历用户目录，重建整个索引"""
+        entries = [e for e in os.scandir(self.root)] if os.path.isdir(self.root) else []
+        subdirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+        dirs: Dict[str, List[int]] = {}
+        root_usage = [0, 0]
+        for e in entries:
+            if not e.is_dir(follow_symlinks=False):
+                root_usage[0] += e.stat(follow_symlinks=False).st_size
+                root_usage[1] += 1
+        with ThreadPoolExecutor(workers) as pool:
+            for totals in pool.map(_scan, subdirs):
+                for dp, usage in totals.items():
+                    dirs[self._rel(dp)] = usage
+        for p in subdirs:
+            usage = dirs[self._rel(p)]
+            root_usage[0] += usage[0]
+            root_usage[1] += usage[1]
+        dirs[""] = root_usage
+        with self.lock:
+            self.dirs = dirs
+            self._mark_dirty()
+        self.save()
+
+    def save(self, min_interval: float = 0):
+        """写入索引文件；距离上次写入不足 `min_interval` 秒时推迟到间隔结束后由定时器写入"""
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                wait = self.saved_at + min_interval - time.time()
+                if wait > 0:
+                    if self.timer is None:
+                        self.timer = threading.Timer(wait, self._flush)
+                        self.timer.daemon = True
+                        self.timer.start()
+                    return
+                data = {k: list(v) for k, v in self.dirs.items()}
+                self.dirty = False
+                self.saved_at = time.time()
+            fs.mkdir(fs.dirname(self.index_path))
+            xio.write_json(data, self.index_path, fsync=True)
+            with self.lock:
+                # 写入期间又有新的修改时保留标记文件
+                if not self.dirty:
+                    fs.rmfiles(self.dirty_path)
+
+    def _flush(self):
+        self.timer = None
+        self.save()
+
+    def close(self):
+        """取消定时器并写入未保存的修改"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.save()
+
+
+@atexit.register
+def _save_all():
+    for index in list(DuIndex._alive):
+        index.close()
@@ -2,10 +2,11 @@
 import time
 import asyncio
 import aiofiles
-from typing import ClassVar, Dict, IO
+from typing import Callable, ClassVar, Dict, IO, Optional
 from os.path import exists, abspath, dirname, basename
 from zex import fs, xio, logger, RoRecord, N
 from .chunk import FileMeta
+from .cas import ContentStore
 from .kdefs import *
 
 
@@ -16,8 +17,20 @@ class AsyncFileHandler:
 
     handlers: ClassVar[Dict[str, "AsyncFileHandler"]] = {}
 
-    def __init__(self, file_path: str, meta: FileMeta, closing_timer_seconds=60) -> None:
+    def __init__(
+        self,
+        file_path: str,
+        meta: FileMeta,
+        closing_timer_seconds=60,
+        on_complete: Optional[Callable[[str], None]] = None,
+        store: Optional[ContentStore] = None,
+        on_replace: Optional[Callable[[str], None]] = None,
+    ) -> None:
         self.file_path = abspath(file_path)
+        self.on_complete = on_complete
+        self.on_replace = on_replace
+        self.store = store
+        self.digest: Optional[str] = None
         self.temp_file_path = self.file_path + ".temp"
         self.temp_meta_path = self.file_path + ".meta"
 
@@ -44,6 +57,8 @@ class AsyncFileHandler:
     def _check_meta(self):
         # 移除所有存在的正式文件和临时文件
         if self.meta.overwrite:
+            if self.on_replace and exists(self.file_path):
+                self.on_replace(self.file_path)
             fs.rmfiles(self.file_path, self.temp_file_path, self.temp_meta_path)
 
         # 临时文件：数据文件和元数据文件都存在才能触发续传
@@ -108,8 +123,14 @@ class AsyncFileHandler:
 
     def complete(self):
         if exists(self.temp_file_path):
-            fs.rename(self.temp_file_path, self.file_path)
+            if self.store:
+                # 内容已存在时丢弃临时文件，正式文件链接到已有对象
+                self.digest = self.store.commit(self.temp_file_path, self.file_path)
+            else:
+                fs.rename(self.temp_file_path, self.file_path)
         fs.rmfiles(self.temp_meta_path)
+        if self.on_complete:
+            self.on_complete(self.file_path)
 
     def set_closing_timer(self):
         if self.closing_timer_task:
@@ -128,18 +149,51 @@ class AsyncFileHandler:
         self.closing_timer_task = asyncio.create_task(main_coro())
 
     @staticmethod
-    async def create(file_path: str, file_meta: FileMeta, closing_timer=60, open_args=None) -> "AsyncFileHandler":
+    async def create(
+        file_path: str,
+        file_meta: FileMeta,
+        closing_timer=60,
+        open_args=None,
+        on_complete=None,
+        store: Optional[ContentStore] = None,
+        on_replace=None,
+    ) -> "AsyncFileHandler":
         """
         - `file_path`: 目标文件路径
         - `file_meta`: FileMeta 对象
         - `closing_timer`: 文件 IO 对象最大空闲时间（秒），超过此时间后文件 IO 对象将会被自动关闭
         - `open_args`: 创建文件 IO 对象需要的参数 (参考 `aiofiles.open()`)
+        - `on_complete`: 文件上传完成后的回调，参数为正式文件路径 (如 `LocalUserFileManager.on_upload_complete`)
+        - `store`: 内容寻址存储，上传完成后对相同内容的文件去重
+        - `on_replace`: `overwrite` 时删除已有正式文件之前的回调，参数为正式文件路径 (如 `LocalUserFileManager.on_upload_replace`)
         """
-        handler = AsyncFileHandler(file_path, file_meta, closing_timer_seconds=closing_timer)
+        handler = AsyncFileHandler(file_path, file_meta, closing_timer, on_complete=on_complete, store=store, on_replace=on_replace)
         await handler.open(open_args=open_args)
         logger.info(f"{handler} is created with closing timer ({handler.closing_timer_seconds} seconds)")
         return handler
 
+    @staticmethod
+    def instant(file_path: str, file_meta: FileMeta, digest: str, store: ContentStore, on_complete=None, on_replace=None) -> bool:
+        """
+        秒传：客户端预先提供内容摘要 (`store.algorithm`，默认 sha256)，存储中已有该内容时直接创建正式文件并返回 True，
+        客户端无需上传；返回 False 时按正常流程调用 `create()` 上传。
+        摘要不能证明客户端拥有文件内容，知道摘要的任何人都能取得该文件，调用方需要自行确认用户有权访问此内容
+        """
+        file_path = abspath(file_path)
+        replaced = exists(file_path)
+        if replaced and not file_meta.overwrite:
+            raise FileHandlerError(f"正式文件已存在: {file_path}")
+        if not store.has(digest):
+            return False
+        if replaced and on_replace:
+            on_replace(file_path)
+        if not store.materialize(digest, file_path):
+            return False
+        fs.rmfiles(file_path + ".temp", file_path + ".meta")
+        if on_complete:
+            on_complete(file_path)
+        return True
+
     @staticmethod
     def get(file_path: str) -> "AsyncFileHandler":
         fh = AsyncFileHandler(file_path)
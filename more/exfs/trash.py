@@ -0,0 +1,226 @@
+# 延迟删除：先原子地移动到回收目录，再在后台清理
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import ClassVar, Dict, List, Optional, Set
+from zex import fs, xio, logger
+from zex.types import RoRecord
+
+K_STAGING = "staging"  # 正在移动到回收目录
+K_STAGED = "staged"  # 已移动到回收目录，等待清理
+K_PURGING = "purging"  # 正在清理
+K_DONE = "done"
+K_FAILED = "failed"
+
+SAVE_INTERVAL = 5  # 清理过程中保存已删除条目数的间隔 (秒)
+
+
+class _Pacer:
+    """限制所有清理线程每秒删除的条目数"""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(self.next_at, now) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Trash:
+    """
+    用户的回收目录。删除任务的目录为 `{trash_dir}/{job_id}`，被删除的路径重命名为其中的 `payload`，
+    任务状态保存在 `{trash_dir}/{job_id}.json` 中，进程重启后通过 `resume()` 继续未完成的任务。
+
+    回收目录必须与被删除的路径位于同一文件系统，否则重命名不是原子的 (会引发 `OSError`)。
+    - `workers`: 每个任务并行清理的线程数，以目录为单位并行 (包括所有层级的子目录)
+    - `rate`: 所有线程每秒最多删除的条目数，None 表示不限制
+    - `retention`: 已完成任务的状态文件保留的秒数 (供 `status()` 查询)，之后由 `prune()` 删除
+    """
+
+    instances: ClassVar[Dict[str, "Trash"]] = {}
+
+    def __init__(self, trash_dir: str, workers=4, rate: Optional[float] = None, retention: float = 3600) -> None:
+        self.trash_dir = fs.mkdir(fs.abspath(trash_dir))
+        self.workers = workers
+        self.retention = retention
+        self.pacer = _Pacer(rate)
+        self.threads: Dict[str, threading.Thread] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def of(cls, trash_dir: str, **kwargs) -> "Trash":
+        """每个回收目录只创建一个实例，首次创建时继续未完成的任务"""
+        key = fs.abspath(trash_dir)
+        if key not in cls.instances:
+            cls.instances[key] = trash = cls(key, **kwargs)
+            trash.resume()
+        return cls.instances[key]
+
+    def _state_path(self, job_id: str):
+        return fs.join(self.trash_dir, f"{job_id}.json")
+
+    def _payload_path(self, job_id: str):
+        return fs.join(self.trash_dir, job_id, "payload")
+
+    def _save(self, state: RoRecord):
+        xio.write_json(state, self._state_path(state["id"]), fsync=True)
+
+    def stage(self, path: str) -> str:
+        """将路径原子地移动到回收目录，返回任务 ID"""
+        job_id = uuid.uuid4().hex
+        state = {"id": job_id, "source": fs.abspath(path), "state": K_STAGING, "created_at": time.time(), "removed": 0}
+        self._save(state)
+        os.mkdir(fs.join(self.trash_dir, job_id))
+        try:
+            os.rename(path, self._payload_path(job_id))
+        except OSError:
+            os.rmdir(fs.join(self.trash_dir, job_id))
+            fs.rmfiles(self._state_path(job_id))
+            raise
+        self._save({**state, "state": K_STAGED})
+        return job_id
+
+    def delete(self, path: str) -> str:
+        """移动到回收目录并在后台清理，返回任务 ID"""
+        job_id = self.stage(path)
+        self.purge_in_background(job_id)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[RoRecord]:
+        state = xio.read_json(self._state_path(job_id))
+        if state is not None and job_id in self.counters:
+            state["removed"] = self.counters[job_id]
+        return state
+
+    def purge_in_background(self, job_id: str):
+        if job_id in self.threads and self.threads[job_id].is_alive():
+            return
+        thread = threading.Thread(target=self.purge, args=(job_id,), daemon=True)
+        self.threads[job_id] = thread
+        thread.start()
+
+    def _count(self, job_id: str):
+        self.pacer.wait()
+        with self.lock:
+            self.counters[job_id] += 1
+
+    def _clear_dir(self, job_id: str, path: str) -> List[str]:
+        """
+        删除目录中除子目录以外的所有条目，返回子目录。
+        同一目录中的删除由该目录的 inode 锁串行执行，因此并行的单位是目录而不是条目
+        """
+        subdirs = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                os.unlink(entry.path)
+                self._count(job_id)
+        return subdirs
+
+    def _remove_tree(self, state: RoRecord, path: str):
+        """
+        以目录为单位在线程池中广度优先地删除文件，同时最多有 `workers * 2` 个目录在处理中，
+        最后自底向上删除所有目录。每隔 `SAVE_INTERVAL` 秒将已删除的条目数写入状态文件
+        """
+        job_id = state["id"]
+        saved_at = time.monotonic()
+
+        def checkpoint():
+            nonlocal saved_at
+            if time.monotonic() - saved_at >= SAVE_INTERVAL:
+                self._save({**state, "state": K_PURGING, "removed": self.counters[job_id]})
+                saved_at = time.monotonic()
+
+        if not os.path.isdir(path) or os.path.islink(path):
+            os.unlink(path)
+            self._count(job_id)
+            return
+        # 子目录总是在其父目录之后被发现，逆序即为自底向上的顺序
+        dirs = [path]
+        queue = deque(dirs)
+        running: Set[Future] = set()
+        with ThreadPoolExecutor(self.workers) as pool:
+            while queue or running:
+                while queue and len(running) < self.workers * 2:
+                    running.add(pool.submit(self._clear_dir, job_id, queue.popleft()))
+                finished, running = wait(running, timeout=SAVE_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    subdirs = future.result()
+                    dirs.extend(subdirs)
+                    queue.extend(subdirs)
+                checkpoint()
+        for d in reversed(dirs[1:]):
+            os.rmdir(d)
+            self._count(job_id)
+            checkpoint()
+        os.rmdir(path)
+
+    def purge(self, job_id: str):
+        """清理一个已经移动到回收目录的任务"""
+        state = xio.read_json(self._state_path(job_id))
+        if state is None or state["state"] == K_DONE:
+            return
+        self.counters[job_id] = state.get("removed", 0)
+        self._save({**state, "state": K_PURGING})
+        payload = self._payload_path(job_id)
+        try:
+            if os.path.lexists(payload):
+                self._remove_tree(state, payload)
+            if os.path.isdir(fs.join(self.trash_dir, job_id)):
+                os.rmdir(fs.join(self.trash_dir, job_id))
+            self._save({**state, "state": K_DONE, "removed": self.counters[job_id], "finished_at": time.time()})
+        except Exception as e:
+            logger.warning(f"Trash job {job_id} failed: {e}")
+            self._save({**state, "state": K_FAILED, "removed": self.counters[job_id], "error": str(e), "finished_at": time.time()})
+        finally:
+            self.counters.pop(job_id, None)
+        self.prune()
+
+    def prune(self):
+        """删除完成时间超过 `retention` 秒的已完成任务的状态文件。失败的任务保留其状态，由 `resume()` 重试"""
+        deadline = time.time() - self.retention
+        for name in os.listdir(self.trash_dir):
+            if not name.endswith(".json"):
+                continue
+            fp = fs.join(self.trash_dir, name)
+            try:
+                state = xio.read_json(fp)
+                if state is not None and state["state"] == K_DONE and state.get("finished_at", 0) <= deadline:
+                    os.remove(fp)
+            except FileNotFoundError:
+                pass  # 被其他清理线程删除
+
+    def resume(self):
+        """继续进程退出前未完成的任务，重试失败的任务，并清理过期的状态文件"""
+        self.prune()
+        for name in os.listdir(self.trash_dir):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-5]
+            state = xio.read_json(self._state_path(job_id))
+            if state is None:
+                continue
+            if state["state"] == K_STAGING:
+                # 重命名之前退出：源路径仍然存在时放弃该任务
+                if not os.path.lexists(self._payload_path(job_id)):
+                    if os.path.isdir(fs.join(self.trash_dir, job_id)):
+                        os.rmdir(fs.join(self.trash_dir, job_id))
+                    fs.rmfiles(self._state_path(job_id))
+                    continue
+                self._save({**state, "state": K_STAGED})
+            if state["state"] in (K_STAGING, K_STAGED, K_PURGING, K_FAILED):
+                self.purge_in_background(job_id)
@@ -3,13 +3,24 @@ import stat
 from zex import fs
 from zex.decorators import ttl_cache
 from typing import Mapping, Optional, Sequence
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Set
 
 as_ms = lambda x: int(x * 1000)
-get_ctime = lambda s: as_ms(os.path.getctime(s))
-get_mtime = lambda s: as_ms(os.path.getmtime(s))
-get_mod = lambda s: stat.filemode(os.stat(s).st_mode)
-get_size_bytes = lambda s: os.path.getsize(s)
+ns_as_ms = lambda ns: ns // 1_000_000
+
+
+def _getstat(s: str) -> os.stat_result:
+    """基于 `fs.getstat`：在 `fs.stat_scope()` 中同一路径只调用一次 stat，路径不存在时与 `os.stat` 一样引发 `FileNotFoundError`"""
+    st = fs.getstat(s)
+    if st is None:
+        raise FileNotFoundError(s)
+    return st
+
+
+get_ctime = lambda s: ns_as_ms(_getstat(s).st_ctime_ns)
+get_mtime = lambda s: ns_as_ms(_getstat(s).st_mtime_ns)
+get_mod = lambda s: stat.filemode(_getstat(s).st_mode)
+get_size_bytes = lambda s: _getstat(s).st_size
 
 TreeNodeInfo = Mapping[str, Any]
 
@@ -25,6 +36,8 @@ class K_FTYPE:
 
 class TreeNode:
     CACHED_NODES: Dict[str, "TreeNode"] = {}
+    # 父路径 -> 子路径，包含所有已缓存节点及其祖先路径，`invalidate` 由此直接找到子树而不遍历全部缓存
+    CACHED_CHILDREN: Dict[str, Set[str]] = {}
     K_FTYPE = K_FTYPE
 
     def __init__(self, path: str, depth: Optional[int] = None):
@@ -37,9 +50,12 @@ class TreeNode:
 
     @property
     def ftype(self):
-        if fs.isfile(self.path):
+        st = fs.getstat(self.path)
+        if st is None:
+            return K_FTYPE.UNKNOWN
+        if stat.S_ISREG(st.st_mode):
             return K_FTYPE.FILE
-        elif fs.isdir(self.path):
+        elif stat.S_ISDIR(st.st_mode):
             return K_FTYPE.DIR
         return K_FTYPE.UNKNOWN
 
@@ -47,28 +63,37 @@ class TreeNode:
         if other not in self.children:
             self.children.append(other)
 
-    @ttl_cache(10, lambda _self, reroot=None: (_self.path, reroot))
-    def base_info(self, reroot: Optional[str] = None) -> Mapping[str, Any]:
+    @ttl_cache(10, lambda _self: _self.path)
+    def _stat_info(self) -> Mapping[str, Any]:
+        TreeNode._index(self.path)  # 节点被 `invalidate` 后仍可能被引用，重新登记以便再次失效
+        st = fs.getstat(self.path)
+        if st is None:
+            raise FileNotFoundError(self.path)
+        ftype = self.ftype
         d = {
             "name": fs.basename(self.path),
-            "type": self.ftype,
-            "ctime": get_ctime(self.path),
-            "mtime": get_mtime(self.path),
-            "mod": get_mod(self.path),
+            "type": ftype,
+            "ctime": ns_as_ms(st.st_ctime_ns),
+            "mtime": ns_as_ms(st.st_mtime_ns),
+            "mod": stat.filemode(st.st_mode),
         }
+        if ftype == K_FTYPE.FILE:
+            d["size_bytes"] = st.st_size
+            d["size"] = fs.format_size(st.st_size)
+        return d
+
+    def base_info(self, reroot: Optional[str] = None) -> Mapping[str, Any]:
+        d = self._stat_info()
         if reroot != None:
             v = fs.relpath(self.path, reroot)
-            d["path"] = "" if v == "." else v
-        if self.ftype == K_FTYPE.FILE:
-            d["size_bytes"] = size = get_size_bytes(self.path)
-            d["size"] = fs.format_size(size)
+            d = {**d, "path": "" if v == "." else v}
         return d
 
     def json(self, reroot: Optional[str] = None, depth=None) -> TreeNodeInfo:
-        if not fs.exists(self.path):
+        if fs.getstat(self.path) is None:
             return None
         d = {**self.base_info(reroot=reroot)}
-        if self.ftype == K_FTYPE.DIR and (dep := depth if depth != None else self.depth) > 0:
+        if d["type"] == K_FTYPE.DIR and (dep := depth if depth != None else self.depth) > 0:
             f_s, d_s, e_s = [], [], []
             for o in self.children:
                 if a := o.json(reroot, dep - 1):
@@ -87,12 +112,43 @@ class TreeNode:
         if abs_path not in TreeNode.CACHED_NODES:
             node = TreeNode(path=abs_path, depth=depth)
             TreeNode.CACHED_NODES[abs_path] = node
+            TreeNode._index(abs_path)
         else:
             node = TreeNode.CACHED_NODES[abs_path]
             if depth:
                 node.depth = depth
         return node
 
+    @staticmethod
+    def _index(path: str):
+        """将路径登记到其父路径下，逐级向上直到祖先路径已经登记"""
+        while (parent := fs.dirname(path)) != path:
+            siblings = TreeNode.CACHED_CHILDREN.setdefault(parent, set())
+            if path in siblings:
+                break
+            siblings.add(path)
+            path = parent
+
+    @staticmethod
+    def invalidate(*paths: str):
+        """
+        删除路径及其所有子路径的节点缓存和信息缓存 (包括父目录的信息缓存)，并从父节点中移除对应的子节点。
+        通过 `CACHED_CHILDREN` 找到子树，耗时与子树大小成正比，与缓存的节点总数无关
+        """
+        for path in paths:
+            path = fs.abspath(path)
+            subtree = [path]
+            for p in subtree:
+                subtree.extend(TreeNode.CACHED_CHILDREN.pop(p, ()))
+            for p in subtree:
+                TreeNode.CACHED_NODES.pop(p, None)
+            parent_path = fs.dirname(path)
+            TreeNode.CACHED_CHILDREN.get(parent_path, set()).discard(path)
+            # 父目录的 mtime 也会随之变化
+            TreeNode._stat_info.cache_pop(parent_path, *subtree)
+            if parent := TreeNode.CACHED_NODES.get(parent_path):
+                parent.children = [o for o in parent.children if o.path != path]
+
     @staticmethod
     def info(a: str, *arr: Sequence[str], reroot: Optional[str] = None):
         node: "TreeNode" = TreeNode.get(a, *arr)
@@ -1,8 +1,13 @@
+import os
+import time
 from dataclasses import dataclass
-from typing import Optional, Mapping, Sequence, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Mapping, Sequence, Any, Dict, List
 from zex import fs
 from zex.xglob import path_matches_any_patterns
 from .tree import TreeNode
+from .trash import Trash
+from .du import DuIndex
 
 
 @dataclass
@@ -46,14 +51,14 @@ def list_with_depth(paths: Sequence[str], depth: int, ignores: Sequence[str] = N
                 nodes.append(node0)
                 if not fs.isdir(path0):
                     continue
+                children = [p for p in (fs.join(path0, name) for name in fs.listdir(path0)) if not ignore(p)]
+                # 并行获取子路径的 stat，在 `fs.stat_scope()` 中之后的查询不再调用系统调用
+                sts = fs.stat_many(children)
                 next_ps = []
-                for name in fs.listdir(path0):
-                    path1 = fs.join(path0, name)
-                    if ignore(path1):
-                        continue
+                for path1, ftype in zip(children, sts.type):
                     node = TreeNode.get(path1, depth=dep - 1)
                     node0.add_child(node)
-                    if fs.isdir(path1):
+                    if ftype == fs.FT_DIR:
                         next_ps.append(path1)
                 recurse(next_ps, dep - 1)
 
@@ -65,8 +70,32 @@ def list_with_depth(paths: Sequence[str], depth: int, ignores: Sequence[str] = N
 
 
 class LocalUserFileManager:
-    def __init__(self, user_dir: str) -> None:
+    def __init__(self, user_dir: str, track_usage=False) -> None:
+        """
+        - `track_usage`: 维护用户目录的磁盘用量索引 (`self.du`)，各项操作完成后增量更新，
+          首次启用且索引文件不存在时会完整遍历一次用户目录
+        """
         self.user_dir = fs.mkdir(user_dir)
+        self._trash: Trash = None
+        self.du: Optional[DuIndex] = DuIndex.of(self.user_dir, self.du_index_path) if track_usage else None
+
+    @property
+    def trash_dir(self):
+        """回收目录与用户目录位于同一父目录下: `{parent}/.trash/{user}`"""
+        user_dir = fs.normpath(fs.abspath(self.user_dir))
+        return fs.join(fs.dirname(user_dir), ".trash", fs.basename(user_dir))
+
+    @property
+    def du_index_path(self):
+        """用量索引与用户目录位于同一父目录下: `{parent}/.du/{user}.json`"""
+        user_dir = fs.normpath(fs.abspath(self.user_dir))
+        return fs.join(fs.dirname(user_dir), ".du", f"{fs.basename(user_dir)}.json")
+
+    @property
+    def trash(self) -> Trash:
+        if self._trash is None:
+            self._trash = Trash.of(self.trash_dir)
+        return self._trash
 
     def get_and_check(self, target: str):
         abs_path: str = fs.abspath(f"{self.user_dir}/{target}")
@@ -76,13 +105,129 @@ class LocalUserFileManager:
 
     def __call__(self, action: str, targets):
         fn = getattr(self, action)
-        return [fn(Target(**td)) for td in targets]
+        results = [fn(Target(**td)) for td in targets]
+        self._save_usage()
+        return results
+
+    def _save_usage(self):
+        if self.du:
+            self.du.save(min_interval=1)
+
+    def _replaced_usage(self, src: str, dst: str):
+        """复制或移动文件 `src` 时，`dst` (或 `dst` 目录中的同名文件) 将被覆盖，在覆盖之前获取其用量"""
+        if not self.du or fs.isdir(src):
+            return None
+        if fs.isdir(dst) and not fs.islink(dst):
+            dst = fs.join(dst, fs.basename(src))
+        if fs.lexists(dst) and not fs.isdir(dst):
+            return self.du.usage_of(dst)
+        return None
+
+    def on_upload_replace(self, file_path: str):
+        """上传的文件将覆盖已有文件时的回调 (参考 `AsyncFileHandler(on_replace=...)`)，在旧文件被删除之前调用"""
+        if self.du and fs.lexists(file_path):
+            self.du.remove_path(file_path, self.du.usage_of(file_path))
+
+    def on_upload_complete(self, file_path: str):
+        """上传完成后的回调 (参考 `AsyncFileHandler(on_complete=...)`)"""
+        TreeNode.invalidate(file_path)
+        if self.du:
+            self.du.add_path(file_path)
+            self._save_usage()
+
+    def usage(self, target: Target):
+        """目录 (包含子目录) 或文件的磁盘用量"""
+        if self.du is None:
+            return RD.failed("Usage tracking is not enabled")
+        try:
+            nbytes, nfiles = self.du.get(self.get_and_check(target.source))
+            return RD.success({"size_bytes": nbytes, "size": fs.format_size(nbytes), "files": nfiles})
+        except Exception as e:
+            return RD.failed(e)
+
+    def _touched_paths(self, action: str, target: Target):
+        """操作涉及的路径：源路径和目标路径 (均包含其子树)"""
+        source = fs.abspath(f"{self.user_dir}/{target.source}")
+        if not target.dest:
+            return [source]
+        if action == "rename":
+            return [source, fs.join(fs.dirname(source), fs.basename(target.dest))]
+        return [source, fs.abspath(f"{self.user_dir}/{target.dest}")]
+
+    def _group_targets(self, action: str, items: List[Target]) -> List[List[int]]:
+        """
+        用并查集对 `items` 的下标分组：涉及的路径 (源路径和目标路径) 父目录相同，或者一个是另一个的祖先 (或相同) 时，
+        两个操作分在同一组，例如 `[move a/x→b/x, delete b/x]`、`[delete a, make a/b/c]`。组内保持原有顺序
+        """
+        parent = list(range(len(items)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+        by_dir: Dict[str, int] = {}
+        entries = []
+        for i, target in enumerate(items):
+            for path in self._touched_paths(action, target):
+                union(i, by_dir.setdefault(fs.dirname(path), i))
+                entries.append((tuple(fs.normpath(path).split(os.sep)), i))
+        # 按路径的各级名称排序后，每个路径的子孙路径紧随其后；与栈中最近的祖先合并即可 (祖先之间已经合并)
+        entries.sort()
+        stack = []
+        for parts, i in entries:
+            while stack and stack[-1][0] != parts[: len(stack[-1][0])]:
+                stack.pop()
+            if stack:
+                union(i, stack[-1][1])
+            stack.append((parts, i))
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(items)):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+    async def call_async(self, action: str, targets, max_workers=8):
+        """
+        `__call__` 的异步版本。涉及的目录有交集 (参考 `_group_targets`) 的操作分为一组按顺序执行，
+        不同组的操作在最多 `max_workers` 个线程中并发执行。
+        结果的顺序与 `targets` 一致，每个结果附带耗时 `elapsed_ms`。
+        """
+        import asyncio
+
+        fn = getattr(self, action)
+        items = [Target(**td) for td in targets]
+        groups = self._group_targets(action, items)
+
+        results: List[Any] = [None] * len(items)
+
+        def run_group(indexes: List[int]):
+            for i in indexes:
+                start = time.perf_counter()
+                result = fn(items[i])
+                results[i] = {**result, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers) as executor:
+            await asyncio.gather(*(loop.run_in_executor(executor, run_group, g) for g in groups))
+        self._save_usage()
+        return results
 
     def rename(self, target: Target):
         try:
             old_path = self.get_and_check(target.source)
             new_path = fs.join(fs.dirname(old_path), fs.basename(target.dest))
+            replaced = self._replaced_usage(old_path, new_path) if old_path != new_path and not fs.isdir(new_path) else None
             fs.rename(old_path, new_path)
+            if self.du and old_path != new_path:
+                self.du.move_path(old_path, new_path, replaced=replaced)
+            TreeNode.invalidate(old_path, new_path)
             data = TreeNode.info(new_path, reroot=self.user_dir)
             return RD.success(data)
         except FileNotFoundError:
@@ -101,24 +246,52 @@ class LocalUserFileManager:
                 return RD.failed(f"Cannot remove the path: {target.source}")
             if not fs.exists(abs_path):
                 return RD.success(None)
+            usage = self.du.usage_of(abs_path) if self.du else None
             if fs.isfile(abs_path):
                 fs.rmfile(abs_path)
             elif fs.isdir(abs_path):
                 fs.rmdir(abs_path)
             else:
                 return RD.failed(f"Cannot remove the path: {target.source} (upsupported file type)")
+            if self.du:
+                self.du.remove_path(abs_path, usage)
+            TreeNode.invalidate(abs_path)
             return RD.success(None)
         except FileNotFoundError:
             return RD.failed(f"Path not found: {target.source}")
         except Exception as e:
             return RD.failed(e)
 
+    def delete_deferred(self, target: Target):
+        """将目标原子地移动到回收目录后立即返回，在后台完成删除。返回删除任务的 ID"""
+        try:
+            abs_path = self.get_and_check(target.source)
+            if abs_path == self.user_dir:
+                return RD.failed(f"Cannot remove the path: {target.source}")
+            if not fs.lexists(abs_path):
+                return RD.success(None)
+            usage = self.du.usage_of(abs_path) if self.du else None
+            job_id = self.trash.delete(abs_path)
+            if self.du:
+                self.du.remove_path(abs_path, usage)
+            TreeNode.invalidate(abs_path)
+            return RD.success({"job": job_id})
+        except Exception as e:
+            return RD.failed(e)
+
+    def delete_status(self, target: Target):
+        """查询删除任务的状态，`target.source` 为任务 ID"""
+        if state := self.trash.status(target.source):
+            return RD.success({k: v for k, v in state.items() if k != "source"})
+        return RD.failed(f"Delete job not found: {target.source}")
+
     def list(self, target: Target):
         max_depth = target.depth or 0
         try:
             full_path = self.get_and_check(target.source)
-            root_node = list_with_depth([full_path], max_depth)[0]
-            data = root_node.json(self.user_dir, depth=max_depth)
+            with fs.stat_scope():
+                root_node = list_with_depth([full_path], max_depth)[0]
+                data = root_node.json(self.user_dir, depth=max_depth)
             return RD.success(data)
         except FileNotFoundError:
             return RD.failed(f"Path not found: {target.source}")
@@ -138,6 +311,9 @@ class LocalUserFileManager:
                 fs.mkdir(abs_path)
             else:
                 return RD.failed(f"Cannot make {target.type} path")
+            if self.du:
+                self.du.add_path(abs_path)
+            TreeNode.invalidate(abs_path)
             return RD.success(TreeNode.info(abs_path, reroot=self.user_dir))
         except Exception as e:
             return RD.failed(f"{e.__class__}: {e}")
@@ -146,7 +322,12 @@ class LocalUserFileManager:
         try:
             old_path = self.get_and_check(target.source)
             new_path = fs.abspath(f"{self.user_dir}/{target.dest}")
-            fs.move(old_path, new_path)
+            usage = self.du.usage_of(old_path) if self.du else None
+            replaced = self._replaced_usage(old_path, new_path)
+            new_path = fs.move(old_path, new_path)
+            if self.du:
+                self.du.move_path(old_path, new_path, usage, replaced)
+            TreeNode.invalidate(old_path, new_path)
             return RD.success(TreeNode.info(new_path, reroot=self.user_dir))
         except FileNotFoundError:
             return RD.failed(f"Source path not found: {target.source}")
@@ -155,10 +336,34 @@ class LocalUserFileManager:
         try:
             old_path = self.get_and_check(target.source)
             new_path = fs.abspath(f"{self.user_dir}/{target.dest}")
+            replaced = self._replaced_usage(old_path, new_path)
+            if fs.isdir(old_path):
+                new_path = fs.copy_dir(old_path, new_path)
+            else:
+                new_path = fs.copy_file(old_path, new_path)
+            if self.du:
+                self.du.add_path(new_path, replaced)
+            TreeNode.invalidate(new_path)
+            return RD.success(TreeNode.info(new_path, reroot=self.user_dir))
+        except FileNotFoundError:
+            return RD.failed(f"Path not found: {target.source}")
+        except Exception as e:
+            return RD.failed(e)
+
+    async def copy_async(self, target: Target, progress=None):
+        """`copy` 的异步版本，目录在线程池中并行复制，`progress` 参考 `fs.copy_dir`"""
+        try:
+            old_path = self.get_and_check(target.source)
+            new_path = fs.abspath(f"{self.user_dir}/{target.dest}")
+            replaced = self._replaced_usage(old_path, new_path)
             if fs.isdir(old_path):
-                fs.copy_dir(old_path, new_path)
+                new_path = await fs.copy_dir_async(old_path, new_path, progress=progress)
             else:
-                fs.copy_file(old_path, new_path)
+                new_path = await fs.copy_file_async(old_path, new_path)
+            if self.du:
+                self.du.add_path(new_path, replaced)
+                self._save_usage()
+            TreeNode.invalidate(new_path)
             return RD.success(TreeNode.info(new_path, reroot=self.user_dir))
         except FileNotFoundError:
             return RD.failed(f"Path not found: {target.source}")
@@ -1,27 +1,42 @@
-from typing import List, Sequence, Tuple
+import os
+import time
+import heapq
+import asyncio
+import pickle
+import hashlib
+import inspect
+import functools
+from collections import deque
+import itertools
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Mapping, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 
 class Node:
+    __slots__ = ("name", "children", "parents", "nodes", "_child_set", "_parent_set")
+
     def __init__(self, name):
         self.name = name
-        self.children = []
-        self.parents = []
+        self.children: List["Node"] = []
+        self.parents: List["Node"] = []
         self.nodes = {}
+        self._child_set = set()
+        self._parent_set = set()
 
     def __str__(self) -> str:
         return self.name
 
     def add_child(self, node):
-        if node not in self.children:
+        if node not in self._child_set:
+            self._child_set.add(node)
             self.children.append(node)
-        if self not in node.parents:
+        if self not in node._parent_set:
+            node._parent_set.add(self)
             node.parents.append(self)
 
     def add_parent(self, node):
-        if node not in self.parents:
-            self.parents.append(node)
-        if self not in node.children:
-            node.children.append(self)
+        node.add_child(self)
 
     @staticmethod
     def get_or_set(nodeset, name: str):
@@ -37,23 +52,47 @@ class Node:
         "获取节点字典中没有父节点的所有节点"
         return [node for node in nodeset.values() if len(node.parents) == 0]
 
-    def bfs(self):
-        def list_children(_nodes):
-            _children = []
-            for _node in _nodes:
-                _children = [*_children, *_node.children]
-            return _children
+    def bfs(self) -> Iterator[List["Node"]]:
+        "逐层产出后代节点，每个节点只出现一次 (位于首次到达的层)"
+        visited = {self}
+        layer = [self]
+        while True:
+            next_layer = []
+            for node in layer:
+                for child in node.children:
+                    if child not in visited:
+                        visited.add(child)
+                        next_layer.append(child)
+            if not next_layer:
+                return
+            yield next_layer
+            layer = next_layer
+
+    def iter_bfs(self) -> Iterator["Node"]:
+        "广度优先遍历后代节点，不包括自身"
+        visited = {self}
+        queue = deque([self])
+        while queue:
+            for child in queue.popleft().children:
+                if child not in visited:
+                    visited.add(child)
+                    queue.append(child)
+                    yield child
 
-        children: List[Node] = [*self.children]
-        while len(children) > 0:
-            yield children
-            children = list_children(children)
+    def iter_dfs(self) -> Iterator["Node"]:
+        "深度优先 (先序) 遍历后代节点，不包括自身"
+        visited = {self}
+        stack = deque(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            yield node
+            stack.extend(reversed(node.children))
 
     def descendants(self) -> Sequence["Node"]:
-        items = []
-        for layer_nodes in self.bfs():
-            items = [*items, *layer_nodes]
-        return items
+        return list(self.iter_bfs())
 
     @staticmethod
     def get_uniq_root(nodes: Sequence["Node"]):
@@ -64,32 +103,400 @@ class Node:
         return root
 
 
+class CycleError(Exception):
+    def __init__(self, path: Sequence[str]) -> None:
+        self.path = list(path)
+        super().__init__(f"Dependency cycle found: {' -> '.join(self.path)}")
+
+
+class DependencyIndex:
+    """
+    基于邻接表的依赖图索引。节点名称映射到其子节点和父节点的有序集合 (dict)，
+    `None` 表示的起点统一记为 `START`。
+    """
+
+    def __init__(self) -> None:
+        self.children: Dict[str, Dict[str, None]] = {}
+        self.parents: Dict[str, Dict[str, None]] = {}
+
+    def add_node(self, name: str):
+        if name not in self.children:
+            self.children[name] = {}
+            self.parents[name] = {}
+
+    def add_edge(self, prev: str, next: str):
+        self.add_node(prev)
+        self.add_node(next)
+        self.children[prev][next] = None
+        self.parents[next][prev] = None
+
+    @staticmethod
+    def from_dependencies(dependencies: Iterable[Tuple[str, str]]) -> "DependencyIndex":
+        index = DependencyIndex()
+        for prev, next in dependencies:
+            index.add_edge(prev or "START", next or "START")
+        return index
+
+    def levels(self) -> Iterator[List[str]]:
+        """Kahn 算法，按层产出节点：每个节点位于从根节点出发的最长路径所在的层。遇到环时引发 `CycleError`"""
+        indegree = {k: len(v) for k, v in self.parents.items()}
+        layer = [k for k, v in indegree.items() if v == 0]
+        visited = 0
+        while layer:
+            yield layer
+            visited += len(layer)
+            next_layer = []
+            for name in layer:
+                for child in self.children[name]:
+                    indegree[child] -= 1
+                    if indegree[child] == 0:
+                        next_layer.append(child)
+            layer = next_layer
+        if visited < len(indegree):
+            raise CycleError(self.find_cycle([k for k, v in indegree.items() if v > 0]))
+
+    def sort(self) -> List[str]:
+        return [name for layer in self.levels() for name in layer]
+
+    def find_cycle(self, candidates: Optional[Iterable[str]] = None) -> List[str]:
+        """迭代 DFS 查找一个环，返回首尾相同的节点路径；没有环时返回空列表"""
+        WHITE, GREY, BLACK = 0, 1, 2
+        color = {}
+        for root in candidates if candidates is not None else self.children:
+            if color.get(root, WHITE) != WHITE:
+                continue
+            color[root] = GREY
+            path = [root]
+            stack = [iter(self.children[root])]
+            while stack:
+                for child in stack[-1]:
+                    c = color.get(child, WHITE)
+                    if c == GREY:
+                        return [*path[path.index(child) :], child]
+                    if c == WHITE:
+                        color[child] = GREY
+                        path.append(child)
+                        stack.append(iter(self.children[child]))
+                        break
+                else:
+                    color[path.pop()] = BLACK
+                    stack.pop()
+        return []
+
+
 def sort_dependencies(dependencies: Sequence[Tuple[str, str]]) -> Sequence[str]:
-    nodes = {}
-    for dep in dependencies:
-        prev = Node.get_or_set(nodes, dep[0] or "START")
-        next = Node.get_or_set(nodes, dep[1] or "START")
-        prev.add_child(next)
-
-    parentless_nodes = Node.get_parentless_nodes(nodes)
-
-    dup_ordered_items = []
-
-    def tree(_nodes):
-        _children = []
-        for _node in _nodes:
-            dup_ordered_items.append(_node.name)
-            _children = [*_children, *_node.children]
-        if len(_children) == 0:
+    """依赖排序 (O(V+E))，存在循环依赖时引发 `CycleError`"""
+    ordered_items = DependencyIndex.from_dependencies(dependencies).sort()
+    return [i for i in ordered_items if i != "START"]
+
+
+@dataclass
+class TaskTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class RunReport:
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+    cancelled: List[str] = field(default_factory=list)  # 因上游失败而未执行的节点
+    timings: Dict[str, TaskTiming] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors and not self.cancelled
+
+
+def _call_task(fn: Callable, upstream: Mapping[str, Any]):
+    start = time.time()
+    try:
+        return True, fn(upstream), start, time.time()
+    except Exception as e:
+        return False, e, start, time.time()
+
+
+async def _call_task_async(fn: Callable, upstream: Mapping[str, Any]):
+    start = time.time()
+    try:
+        if inspect.iscoroutinefunction(fn):
+            result = await fn(upstream)
+        else:
+            result = await asyncio.to_thread(fn, upstream)
+        return True, result, start, time.time()
+    except Exception as e:
+        return False, e, start, time.time()
+
+
+class _Scheduler:
+    """就绪节点按关键路径长度 (自身及所有下游节点的最大累计成本) 从大到小出队"""
+
+    def __init__(self, index: DependencyIndex, costs: Optional[Mapping[str, float]], done: Optional[Mapping[str, Any]]):
+        self.index = index
+        self.report = RunReport(results={**(done or {})})
+        self.priority: Dict[str, float] = {}
+        for layer in reversed(list(index.levels())):
+            for name in layer:
+                cost = costs.get(name, 1) if costs else 1
+                self.priority[name] = cost + max((self.priority[c] for c in index.children[name]), default=0)
+        results = self.report.results
+        self.pending = {k: sum(1 for p in v if p not in results) for k, v in index.parents.items()}
+        self.ready = []
+        self.counter = itertools.count()
+        for name, n in self.pending.items():
+            if n == 0 and name not in results:
+                self._push(name)
+
+    def _push(self, name: str):
+        heapq.heappush(self.ready, (-self.priority[name], next(self.counter), name))
+
+    def pop(self) -> str:
+        return heapq.heappop(self.ready)[2]
+
+    def upstream(self, name: str) -> Mapping[str, Any]:
+        results = self.report.results
+        return {p: results[p] for p in self.index.parents[name] if p != "START"}
+
+    def settle(self, name: str, outcome):
+        ok, value, start, end = outcome
+        self.report.timings[name] = TaskTiming(start, end)
+        if not ok:
+            self.report.errors[name] = value
             return
-        tree(_children)
+        self.finish(name, value)
 
-    tree(parentless_nodes)
+    def finish(self, name: str, value):
+        self.report.results[name] = value
+        for child in self.index.children[name]:
+            self.pending[child] -= 1
+            if self.pending[child] == 0 and child not in self.report.results:
+                self._push(child)
 
-    ordered_items = []
-    for i in dup_ordered_items[::-1]:
-        if i not in ordered_items:
-            ordered_items.append(i)
+    def close(self) -> RunReport:
+        report = self.report
+        report.cancelled = [k for k in self.pending if k not in report.results and k not in report.errors]
+        report.results.pop("START", None)
+        return report
 
-    ordered_items = ordered_items[::-1]
-    return [i for i in ordered_items if i != "START"]
+
+def run_dependencies(
+    dependencies: Sequence[Tuple[str, str]],
+    tasks: Mapping[str, Callable[[Mapping[str, Any]], Any]],
+    mode="thread",
+    max_workers: Optional[int] = None,
+    costs: Optional[Mapping[str, float]] = None,
+    done: Optional[Mapping[str, Any]] = None,
+) -> RunReport:
+    """
+    并发执行依赖图中的任务。
+    - `dependencies`: 与 `sort_dependencies` 相同的依赖对
+    - `tasks`: 节点名称到可调用对象的映射，调用参数为上游节点结果的字典 `{ 节点名称: 结果 }`；没有可调用对象的节点结果为 `None`
+    - `mode`: `"thread"` | `"process"` | `"async"`，`"process"` 模式下可调用对象及其结果必须可以被 pickle
+    - `max_workers`: 最大并发数，默认为 CPU 核数
+    - `costs`: 节点的预估成本，用于关键路径优先调度，默认均为 1
+    - `done`: 已有结果的节点，这些节点不会再被执行
+
+    节点失败时其所有下游节点都不会被执行，记录在 `RunReport.cancelled` 中。
+    `"process"` 模式下 pickle 失败、工作进程崩溃等错误同样记录为对应节点的失败。
+    """
+    if mode == "async":
+        return asyncio.run(run_dependencies_async(dependencies, tasks, max_workers, costs=costs, done=done))
+    if mode == "thread":
+        pool_cls = ThreadPoolExecutor
+    elif mode == "process":
+        pool_cls = ProcessPoolExecutor
+    else:
+        raise ValueError(f"Invalid mode: {mode}")
+
+    max_workers = max_workers or os.cpu_count() or 1
+    scheduler = _Scheduler(DependencyIndex.from_dependencies(dependencies), costs, done)
+    with pool_cls(max_workers) as pool:
+        running: Dict[Future, str] = {}
+        while True:
+            while scheduler.ready and len(running) < max_workers:
+                name = scheduler.pop()
+                if (fn := tasks.get(name)) is None:
+                    scheduler.finish(name, None)
+                    continue
+                try:
+                    running[pool.submit(_call_task, fn, scheduler.upstream(name))] = name
+                except Exception as e:  # 进程池已损坏 (BrokenProcessPool) 时提交失败
+                    scheduler.settle(name, (False, e, time.time(), time.time()))
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                # `_call_task` 已捕获任务自身的异常，这里是参数或结果无法 pickle、工作进程崩溃 (BrokenProcessPool) 等池级别的错误
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = (False, e, time.time(), time.time())
+                scheduler.settle(running.pop(future), outcome)
+    return scheduler.close()
+
+
+async def run_dependencies_async(
+    dependencies: Sequence[Tuple[str, str]],
+    tasks: Mapping[str, Callable[[Mapping[str, Any]], Any]],
+    max_workers: Optional[int] = None,
+    costs: Optional[Mapping[str, float]] = None,
+    done: Optional[Mapping[str, Any]] = None,
+) -> RunReport:
+    """`run_dependencies` 的 asyncio 版本，协程函数直接等待，普通函数在线程中执行"""
+    max_workers = max_workers or os.cpu_count() or 1
+    scheduler = _Scheduler(DependencyIndex.from_dependencies(dependencies), costs, done)
+    running: Dict[asyncio.Task, str] = {}
+    while True:
+        while scheduler.ready and len(running) < max_workers:
+            name = scheduler.pop()
+            if (fn := tasks.get(name)) is None:
+                scheduler.finish(name, None)
+                continue
+            running[asyncio.create_task(_call_task_async(fn, scheduler.upstream(name)))] = name
+        if not running:
+            break
+        finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            scheduler.settle(running.pop(task), task.result())
+    return scheduler.close()
+
+
+def fingerprint(*values) -> str:
+    """基于 pickle 序列化结果的内容指纹"""
+    return hashlib.sha1(pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class MemoryResultCache:
+    def __init__(self) -> None:
+        self.data: Dict[str, Any] = {}
+
+    def has(self, key: str) -> bool:
+        return key in self.data
+
+    def get(self, key: str):
+        return self.data[key]
+
+    def set(self, key: str, value):
+        self.data[key] = value
+
+
+class DiskResultCache:
+    """以 pickle 文件保存结果：`{cache_dir}/{key[:2]}/{key}`"""
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def _path(self, key: str):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str):
+        with open(self._path(key), "rb") as fr:
+            return pickle.load(fr)
+
+    def set(self, key: str, value):
+        fp = self._path(key)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp + ".temp", "wb") as fw:
+            pickle.dump(value, fw, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fp + ".temp", fp)
+
+
+def _call_with_input(fn: Callable, value, upstream: Mapping[str, Any]):
+    return fn(value, upstream)
+
+
+class IncrementalGraph:
+    """
+    增量执行的依赖图。
+    - `tasks`: 节点名称到可调用对象的映射，调用参数为 `(节点输入, 上游节点结果的字典)`
+    - `cache`: 结果缓存，需要实现 `has/get/set`，默认为 `MemoryResultCache`
+
+    节点指纹由节点名称、节点输入和上游节点的指纹计算得到。每次执行时只有输入发生变化的节点及其所有下游节点
+    (`Node.descendants`) 会重新计算指纹，指纹已存在于缓存中的节点不再执行。
+    只有下游节点需要执行时才从缓存载入结果，其余节点的结果通过 `result(name)` 读取。
+    """
+
+    def __init__(
+        self,
+        dependencies: Sequence[Tuple[str, str]],
+        tasks: Mapping[str, Callable[[Any, Mapping[str, Any]], Any]],
+        cache=None,
+        mode="thread",
+        max_workers: Optional[int] = None,
+    ) -> None:
+        self.dependencies = list(dependencies)
+        self.tasks = tasks
+        self.cache = cache if cache is not None else MemoryResultCache()
+        self.mode = mode
+        self.max_workers = max_workers
+        self.index = DependencyIndex.from_dependencies(self.dependencies)
+        self.order = self.index.sort()
+        self.nodes: Dict[str, Node] = {}
+        for prev, next in self.dependencies:
+            Node.get_or_set(self.nodes, prev or "START").add_child(Node.get_or_set(self.nodes, next or "START"))
+        self.input_digests: Dict[str, str] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.settled: Set[str] = set()  # 当前指纹的结果已在缓存中的节点
+
+    def result(self, name: str):
+        """从缓存读取节点在最近一次执行中的结果"""
+        return self.cache.get(self.fingerprints[name])
+
+    def run(self, inputs: Optional[Mapping[str, Any]] = None, changed: Optional[Iterable[str]] = None) -> RunReport:
+        """
+        - `inputs`: 节点输入 `{ 节点名称: 输入 }`
+        - `changed`: 已知发生变化的节点，提供时只对这些节点的输入计算指纹
+
+        返回的 `RunReport.timings` 中只包含本次实际执行的节点，`RunReport.results` 中只包含本次执行或从缓存载入的节点。
+        """
+        inputs = inputs or {}
+        names = self.order if changed is None else [*changed, *(k for k in self.order if k not in self.fingerprints)]
+        dirty = set()
+        for name in names:
+            digest = fingerprint(inputs.get(name))
+            if name not in self.fingerprints or self.input_digests.get(name) != digest:
+                self.input_digests[name] = digest
+                dirty.add(name)
+                dirty.update(node.name for node in self.nodes[name].descendants())
+
+        for name in self.order:
+            if name in dirty:
+                parent_fps = [self.fingerprints[p] for p in self.index.parents[name]]
+                self.fingerprints[name] = fingerprint(name, self.input_digests[name], parent_fps)
+                self.settled.discard(name)
+
+        # 指纹未变化且上次执行成功的节点不再查询缓存，其余节点的指纹可能已存在于缓存中 (例如输入恢复为旧值)
+        tasks = {}
+        for name in self.order:
+            if name in self.settled:
+                continue
+            if self.cache.has(self.fingerprints[name]):
+                self.settled.add(name)
+            elif (fn := self.tasks.get(name)) is not None:
+                tasks[name] = functools.partial(_call_with_input, fn, inputs.get(name))
+
+        # 只有存在需要执行的下游节点时才载入结果，其余节点以占位值标记为已完成
+        done = {}
+        skipped = []
+        for name in self.settled:
+            if any(child in tasks for child in self.index.children[name]):
+                done[name] = self.cache.get(self.fingerprints[name])
+            else:
+                done[name] = None
+                skipped.append(name)
+
+        report = run_dependencies(self.dependencies, tasks, self.mode, self.max_workers, done=done)
+        for name in skipped:
+            report.results.pop(name, None)
+        for name in report.timings:
+            if name in report.results:
+                self.cache.set(self.fingerprints[name], report.results[name])
+                self.settled.add(name)
+        return report
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 仓库目录即 zex 包本身；未安装 zex 且目录名不是 zex 时，通过名为 zex 的符号链接导入
+if importlib.util.find_spec("zex") is None:
+    if os.path.basename(ROOT) == "zex":
+        sys.path.insert(0, os.path.dirname(ROOT))
+    else:
+        _link_dir = tempfile.mkdtemp(prefix="zex-tests-")
+        os.symlink(ROOT, os.path.join(_link_dir, "zex"))
+        sys.path.insert(0, _link_dir)
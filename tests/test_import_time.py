@@ -0,0 +1,44 @@
+# `import zex` 的导入耗时预算，防止子模块或重依赖重新变成导入时加载
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 累计耗时 (微秒)，`python -X importtime` 中 zex 一行的 cumulative 列
+BUDGET_US = 50_000
+HEAVY = ("loguru", "logging", "asyncio", "concurrent.futures", "numpy", "orjson", "tempfile")
+
+
+def _run(code: str, tmp_path):
+    # 仓库目录即 zex 包本身，通过名为 zex 的符号链接导入；不在仓库目录中运行，避免 zex/types.py 遮蔽标准库
+    if os.path.basename(ROOT) == "zex":
+        path = os.path.dirname(ROOT)
+    else:
+        if not (tmp_path / "zex").exists():
+            os.symlink(ROOT, tmp_path / "zex")
+        path = str(tmp_path)
+    env = dict(os.environ, PYTHONPATH=path)
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def _cumulative_us(stderr: str, module: str) -> int:
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_import_zex_budget(tmp_path):
+    proc = _run("import sys, zex; print(' '.join(sys.modules))", tmp_path)
+    modules = set(proc.stdout.split())
+    assert modules & {"zex", "zex.types"} == {"zex", "zex.types"}
+    assert not [m for m in HEAVY if m in modules]
+    # 取三次中的最小值，降低机器负载的影响
+    best = min(_cumulative_us(_run("import zex", tmp_path).stderr, "zex") for _ in range(3))
+    assert best < BUDGET_US, f"import zex took {best}us, budget {BUDGET_US}us"
@@ -0,0 +1,83 @@
+import pytest
+from zex.more.taskgraph import CycleError, IncrementalGraph, run_dependencies, sort_dependencies
+
+DEPS = [(None, "a"), ("a", "b"), ("b", "c"), (None, "x"), ("x", "c"), (None, "d")]
+
+
+def test_sort_dependencies_order():
+    order = sort_dependencies(DEPS)
+    assert sorted(order) == ["a", "b", "c", "d", "x"]
+    for prev, next in DEPS:
+        if prev:
+            assert order.index(prev) < order.index(next)
+
+
+def test_sort_dependencies_cycle():
+    with pytest.raises(CycleError) as exc:
+        sort_dependencies([("a", "b"), ("b", "c"), ("c", "a"), (None, "a")])
+    assert set(exc.value.path) >= {"a", "b", "c"}
+
+
+@pytest.mark.parametrize("mode", ["thread", "async"])
+def test_failure_cancels_downstream(mode):
+    ran = []
+
+    def task(name):
+        def fn(upstream):
+            ran.append(name)
+            if name == "b":
+                raise RuntimeError("boom")
+            return name
+
+        return fn
+
+    report = run_dependencies(DEPS, {n: task(n) for n in "abcdx"}, mode=mode)
+    assert isinstance(report.errors["b"], RuntimeError)
+    assert report.cancelled == ["c"]
+    assert "c" not in ran
+    assert report.results == {"a": "a", "d": "d", "x": "x"}
+    assert not report.success
+
+
+def test_incremental_rerun_set():
+    ran = []
+
+    def task(name):
+        def fn(value, upstream):
+            ran.append(name)
+            return (value or 0) + sum(upstream.values())
+
+        return fn
+
+    graph = IncrementalGraph(DEPS, {n: task(n) for n in "abcdx"})
+
+    def run(inputs):
+        ran.clear()
+        report = graph.run(inputs)
+        assert set(report.timings) == set(ran)
+        return sorted(ran)
+
+    assert run({"a": 1, "x": 2, "d": 3}) == ["a", "b", "c", "d", "x"]
+    assert run({"a": 1, "x": 2, "d": 3}) == []
+    # 只有 x 及其下游节点 c 重新执行
+    assert run({"a": 1, "x": 5, "d": 3}) == ["c", "x"]
+    assert graph.result("c") == 6
+    # 输入恢复为旧值时使用缓存结果
+    assert run({"a": 1, "x": 2, "d": 3}) == []
+    assert graph.result("c") == 3
+
+
+def _process_task(name, upstream):
+    if name == "b":
+        return lambda: None  # 结果无法 pickle，在工作进程中失败
+    return name
+
+
+def test_process_pool_error_cancels_downstream():
+    from functools import partial
+
+    tasks = {n: partial(_process_task, n) for n in "abcdx"}
+    report = run_dependencies(DEPS, tasks, mode="process", max_workers=2)
+    assert "b" in report.errors
+    assert report.cancelled == ["c"]
+    assert report.results == {"a": "a", "d": "d", "x": "x"}
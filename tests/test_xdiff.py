@@ -0,0 +1,32 @@
+import sys
+import pytest
+from zex.xdiff import diff_columns, diff_records
+
+TARGET = {"id": [5, 1, 7, 3], "v": [50, 10, 70, 31], "w": ["e", "a", "g", "c"]}
+REF = {"id": [2, 3, 1, 4], "v": [20, 30, 10, 40], "w": ["b", "c", "x", "d"]}
+
+
+def _rows(cols):
+    return [{c: cols[c][i] for c in cols} for i in range(len(cols["id"]))]
+
+
+def test_diff_columns_order():
+    ops = diff_columns(TARGET, REF, "id")
+    assert ops == list(diff_records(_rows(TARGET), _rows(REF), lambda d: d["id"], fields=["v", "w"]))
+    # 插入和更新按 target 顺序，之后是按 ref 顺序的删除
+    assert [(o.op, o.key) for o in ops] == [("insert", 5), ("update", 1), ("insert", 7), ("update", 3), ("delete", 2), ("delete", 4)]
+
+
+def test_diff_columns_duplicate_keys():
+    with pytest.raises(ValueError):
+        diff_columns({"id": [1, 1], "v": [1, 2]}, REF, "id")
+    with pytest.raises(ValueError):
+        diff_columns(TARGET, {"id": [3, 3], "v": [1, 2]}, "id")
+
+
+def test_diff_columns_numpy_matches_fallback(monkeypatch):
+    np = pytest.importorskip("numpy")
+    target = {c: np.asarray(v) for c, v in TARGET.items()}
+    ops = diff_columns(target, REF, "id")
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    assert ops == diff_columns(TARGET, REF, "id")
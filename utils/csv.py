@@ -1,3 +1,16 @@
+import io
+import os
+import csv
+import mmap
+import functools
+from collections import namedtuple
+from operator import methodcaller
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Callable, Iterator, List, Mapping, Optional, Sequence, Union
+
+CHUNK_SIZE = 1 << 20
+
+
 def parse_tsv(file_reader, row_handler=None):
 
     def readline(reader):
@@ -16,3 +29,353 @@ def parse_tsv(file_reader, row_handler=None):
                 row = row_handler(row, headers=headers)
             data.append(row)
     return data
+
+
+def iter_lines(reader: IO, encoding="utf-8", chunk_size=CHUNK_SIZE) -> Iterator[List[str]]:
+    """
+    以大块读取的方式逐批产出文本行 (不包括换行符)。二进制数据按块解码，
+    块的边界总是落在换行符上，因此不会截断多字节字符。
+    """
+    rest = b"" if isinstance(reader.read(0), bytes) else ""
+    newline = b"\n" if isinstance(rest, bytes) else "\n"
+    while chunk := reader.read(chunk_size):
+        idx = chunk.rfind(newline)
+        if idx == -1:
+            rest += chunk
+            continue
+        text = rest + chunk[:idx]
+        rest = chunk[idx + 1 :]
+        yield (text.decode(encoding) if isinstance(text, bytes) else text).split("\n")
+    if rest:
+        yield [rest.decode(encoding) if isinstance(rest, bytes) else rest]
+
+
+def _open(file_or_path: Union[str, IO]):
+    if isinstance(file_or_path, str):
+        return open(file_or_path, "rb"), True
+    return file_or_path, False
+
+
+def _row_factory(headers: Sequence[str], row_type: str):
+    if row_type == "tuple":
+        return tuple
+    if row_type == "namedtuple":
+        return namedtuple("TsvRow", headers, rename=True)._make
+    if row_type == "dict":
+        return lambda values: dict(zip(headers, values))
+    raise ValueError(f"Invalid row type: {row_type}")
+
+
+def _iter_split_rows(reader: IO, sep: str, encoding: str, chunk_size: int):
+    for lines in iter_lines(reader, encoding=encoding, chunk_size=chunk_size):
+        # 先去掉 \r 再过滤，CRLF 文件中的空行只剩下 "\r"
+        yield [line.split(sep) for line in map(methodcaller("rstrip", "\r"), lines) if line]
+
+
+def _iter_quoted_rows(reader: IO, sep: str, encoding: str, chunk_size: int):
+    wrapper = io.TextIOWrapper(reader, encoding=encoding, newline="") if isinstance(reader.read(0), bytes) else None
+    try:
+        batch = []
+        for row in csv.reader(wrapper or reader, delimiter=sep):
+            if row:
+                batch.append(row)
+                if len(batch) >= 4096:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    finally:
+        if wrapper is not None:
+            wrapper.detach()
+
+
+def iter_tsv(
+    file_or_path: Union[str, IO],
+    sep="\t",
+    encoding="utf-8",
+    row_type="tuple",
+    batch_size: Optional[int] = None,
+    quoting=False,
+    headers: Optional[Sequence[str]] = None,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    流式读取 TSV/CSV 文件，内存占用与文件大小无关。空行会被跳过。
+    - `file_or_path`: 文件路径或者文件对象 (二进制或文本)
+    - `row_type`: `"tuple"` | `"namedtuple"` | `"dict"`
+    - `batch_size`: 指定时每次产出一批 (最多 `batch_size` 行) 的列表，否则逐行产出
+    - `quoting`: 是否处理引号包裹的字段 (字段内可以包含分隔符和换行符)，基于标准库 `csv`，速度较慢
+    - `headers`: 列名；没有指定时使用第一行作为列名
+    """
+    reader, owned = _open(file_or_path)
+    try:
+        split_rows = _iter_quoted_rows if quoting else _iter_split_rows
+        batches = split_rows(reader, sep, encoding, chunk_size)
+        make_row = None
+        batch = []
+        for rows in batches:
+            if not rows:
+                continue
+            if make_row is None:
+                if headers is None:
+                    headers, rows = rows[0], rows[1:]
+                make_row = _row_factory(headers, row_type)
+            if batch_size is None:
+                yield from map(make_row, rows)
+                continue
+            batch.extend(map(make_row, rows))
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        if batch:
+            yield batch
+    finally:
+        if owned:
+            reader.close()
+
+
+def _to_columns(rows: List[Sequence[str]], ncols: int):
+    if rows and all(map(ncols.__eq__, map(len, rows))):
+        return [list(c) for c in zip(*rows)]
+    # 字段数不一致时，缺失的字段以空字符串补齐，多余的字段被忽略
+    columns = [[] for _ in range(ncols)]
+    for row in rows:
+        n = len(row)
+        for i, column in enumerate(columns):
+            column.append(row[i] if i < n else "")
+    return columns
+
+
+def _lines_to_columns(lines: List[str], sep: str, ncols: int):
+    """每行字段数一致时，将所有行合并后一次切分，再通过切片得到各列"""
+    lines = [line.rstrip("\r") for line in lines]
+    # 逐行检查分隔符个数：只比较字段总数时，长短不一的行可能恰好凑成相同的总数，导致字段错位
+    if not all(map((ncols - 1).__eq__, map(methodcaller("count", sep), lines))):
+        return _to_columns([line.split(sep) for line in lines], ncols)
+    fields = sep.join(lines).split(sep)
+    return [fields[i::ncols] for i in range(ncols)]
+
+
+def _as_numpy(columns: List[list]):
+    import numpy as np
+
+    return [np.asarray(c) for c in columns]
+
+
+def read_tsv_columns(file_or_path: Union[str, IO], sep="\t", encoding="utf-8", quoting=False, numpy=False):
+    """按列读取 TSV 文件，返回 `{ 列名: 列值 }`；`numpy=True` 时列值为 NumPy 数组"""
+    headers = None
+    columns = None
+    reader, owned = _open(file_or_path)
+    try:
+        split_rows = _iter_quoted_rows if quoting else _iter_split_rows
+        for rows in split_rows(reader, sep, encoding, CHUNK_SIZE):
+            if not rows:
+                continue
+            if headers is None:
+                headers, rows = rows[0], rows[1:]
+                columns = [[] for _ in headers]
+            for column, values in zip(columns, _to_columns(rows, len(headers))):
+                column.extend(values)
+    finally:
+        if owned:
+            reader.close()
+    if headers is None:
+        return {}
+    if numpy:
+        columns = _as_numpy(columns)
+    return dict(zip(headers, columns))
+
+
+def _split_offsets(filepath: str, parts: int):
+    """将文件按换行符划分为 `parts` 段，返回 `(表头行的字节, [(start, end), ...])`"""
+    if os.path.getsize(filepath) == 0:
+        return b"", []  # 不能 mmap 空文件
+    with open(filepath, "rb") as fr, mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        header_end = mm.find(b"\n") + 1 or size
+        bounds = [header_end]
+        step = max((size - header_end) // parts, 1)
+        for i in range(1, parts):
+            pos = mm.find(b"\n", max(header_end + step * i, bounds[-1]))
+            if pos == -1:
+                break
+            bounds.append(pos + 1)
+        bounds.append(size)
+        ranges = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+        return mm[:header_end], ranges
+
+
+def _parse_range(filepath: str, start: int, end: int, sep: str, encoding: str, columns: Optional[int]):
+    with open(filepath, "rb") as fr:
+        fr.seek(start)
+        text = fr.read(end - start).decode(encoding)
+    rows = [line.split(sep) for line in map(methodcaller("rstrip", "\r"), text.split("\n")) if line]
+    return _to_columns(rows, columns) if columns else rows
+
+
+def parse_tsv_parallel(filepath: str, sep="\t", encoding="utf-8", workers: Optional[int] = None, columnar=False, numpy=False):
+    """
+    多进程解析 TSV 文件：通过 mmap 在换行符处将文件切分成若干段，每个进程解析一段。不支持引号包裹的字段。
+    - `columnar=False`: 返回 `(headers, rows)`，`rows` 为字符串列表的列表
+    - `columnar=True`: 返回 `{ 列名: 列值 }`；`numpy=True` 时列值为 NumPy 数组
+    """
+    workers = workers or os.cpu_count() or 1
+    header, ranges = _split_offsets(filepath, workers)
+    if not header:
+        return {} if columnar else ([], [])
+    headers = header.decode(encoding).rstrip("\r\n").split(sep)
+    ncols = len(headers) if columnar else None
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_parse_range, filepath, a, b, sep, encoding, ncols) for a, b in ranges]
+        parts = [f.result() for f in futures]
+    if not columnar:
+        return headers, [row for part in parts for row in part]
+    columns = [[] for _ in headers]
+    for part in parts:
+        for column, values in zip(columns, part):
+            column.extend(values)
+    if numpy:
+        columns = _as_numpy(columns)
+    return dict(zip(headers, columns))
+
+
+def _maybe_float(v):
+    try:
+        return float(v)
+    except Exception:
+        return None
+
+
+def _as_bool(v: str):
+    return v.strip().lower() in ("1", "true", "yes", "y", "t")
+
+
+class TsvSchema:
+    """
+    TSV 列类型声明 `{ 列名: 转换器 }`，未声明的列保持为字符串。转换器可以是：
+    - `"str"` | `"int"` | `"float"` | `"bool"` | `"maybe_int"` | `"maybe_float"`
+    - `("datetime", fmt)`: 通过 `xdt.str_to_milliseconds` 转换为毫秒时间戳
+    - 任意接收单个字符串的可调用对象
+
+    转换器在 `compile()` 时解析一次，之后按列批量应用；安装了 NumPy 且 `numpy=True` 时，
+    `int` / `float` 列通过 NumPy 向量化转换，结果列为 NumPy 数组。
+    """
+
+    def __init__(self, columns: Mapping[str, Any], numpy=False) -> None:
+        self.columns = dict(columns)
+        self.numpy = numpy
+
+    @staticmethod
+    def resolve(conv) -> Callable[[str], Any]:
+        from zex import xdt, xstr
+
+        if callable(conv):
+            return conv
+        if isinstance(conv, (tuple, list)) and conv[0] == "datetime":
+            return functools.partial(xdt.str_to_milliseconds, fmt=conv[1])
+        builtin = {
+            "str": str,
+            "int": int,
+            "float": float,
+            "bool": _as_bool,
+            "maybe_int": xstr.maybe_int,
+            "maybe_float": _maybe_float,
+        }
+        if conv in builtin:
+            return builtin[conv]
+        raise ValueError(f"Invalid column converter: {conv}")
+
+    def compile(self, headers: Sequence[str]) -> Callable[[List[list]], List[Any]]:
+        """根据表头生成批量转换函数：输入为原始字符串列，输出为转换后的列"""
+        missing = [k for k in self.columns if k not in headers]
+        if missing:
+            raise KeyError(f"Columns not found in headers: {missing}")
+
+        np = None
+        if self.numpy:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+
+        plan = []
+        for name in headers:
+            conv = self.columns.get(name, "str")
+            if np is not None and conv in ("int", "float"):
+                dtype = np.int64 if conv == "int" else np.float64
+                plan.append(lambda col, dtype=dtype: np.asarray(col).astype(dtype))
+            elif conv == "str":
+                plan.append(None)
+            else:
+                fn = self.resolve(conv)
+                plan.append(lambda col, fn=fn: list(map(fn, col)))
+
+        def convert(columns: List[list]) -> List[Any]:
+            return [col if fn is None else fn(col) for fn, col in zip(plan, columns)]
+
+        return convert
+
+
+def iter_tsv_typed(
+    file_or_path: Union[str, IO],
+    schema: TsvSchema,
+    sep="\t",
+    encoding="utf-8",
+    batch_size=65536,
+    columnar=True,
+    quoting=False,
+):
+    """
+    按批读取并转换 TSV 文件，不需要逐行回调。
+    - `columnar=True`: 每批产出 `{ 列名: 转换后的列 }`
+    - `columnar=False`: 每批产出元组列表
+    """
+    headers = None
+    convert = None
+    reader, owned = _open(file_or_path)
+    try:
+        if quoting:
+            batches = _iter_quoted_rows(reader, sep, encoding, CHUNK_SIZE)
+            to_columns = _to_columns
+        else:
+            batches = iter_lines(reader, encoding=encoding)
+            to_columns = lambda lines, ncols: _lines_to_columns(lines, sep, ncols)
+
+        def emit(items):
+            columns = convert(to_columns(items, len(headers)))
+            return dict(zip(headers, columns)) if columnar else list(zip(*columns))
+
+        pending = []
+        for items in batches:
+            pending.extend(i for i in items if i and i != "\r")
+            if headers is None:
+                if not pending:
+                    continue
+                head = pending.pop(0)
+                headers = head if quoting else head.rstrip("\r").split(sep)
+                convert = schema.compile(headers)
+            while len(pending) >= batch_size:
+                yield emit(pending[:batch_size])
+                pending = pending[batch_size:]
+        if pending:
+            yield emit(pending)
+    finally:
+        if owned:
+            reader.close()
+
+
+def read_tsv_typed(file_or_path: Union[str, IO], schema: TsvSchema, sep="\t", encoding="utf-8", quoting=False):
+    """读取并转换整个 TSV 文件，返回 `{ 列名: 转换后的列 }`"""
+    result = {}
+    for batch in iter_tsv_typed(file_or_path, schema, sep=sep, encoding=encoding, quoting=quoting):
+        for name, column in batch.items():
+            if name not in result:
+                result[name] = column
+            elif isinstance(column, list):
+                result[name].extend(column)
+            else:
+                import numpy as np
+
+                result[name] = np.concatenate([result[name], column])
+    return result
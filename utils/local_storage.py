@@ -1,39 +1,268 @@
+import os
+import threading
+from contextlib import contextmanager
 from zex import fs, xlist, xio
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """
+    基于 `fcntl.flock` 的读写锁，锁文件为 `path`。同一个对象在同一线程内可以嵌套加锁 (内层加锁不生效)，
+    同一进程内的多个线程之间互斥。不支持 `fcntl` 的平台上只有线程间互斥。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+
+    @contextmanager
+    def __call__(self, shared=False):
+        with self._rlock:
+            if self._depth > 0 or fcntl is None:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
 
 class LocalStorage:
+    """
+    以 JSON 数组文件保存的列表。读操作持有共享锁，写操作持有排他锁，写入通过临时文件 + `os.replace` 完成，
+    因此可以在多个进程之间共享同一个文件。在 `transaction()` 中的多次修改只读写一次文件。
+    """
 
     def __init__(self, fp: str, fk=None) -> None:
         self.filepath = fp
         self.fk = fk
         self.data = []
+        self.lock = FileLock(fp + ".lock")
+        self._in_transaction = False
 
     def _read(self):
+        if self._in_transaction:
+            return
         if fs.exists(self.filepath):
             self.data = xio.read_json(self.filepath)
         else:
             self.data = []
 
     def _write(self):
-        xio.write_json(self.data, self.filepath)
+        if self._in_transaction:
+            return
+        xio.write_json(self.data, self.filepath, fsync=True)
+
+    @contextmanager
+    def transaction(self):
+        """在排他锁内读取一次文件，退出时 (没有异常的情况下) 写入一次文件"""
+        if self._in_transaction:
+            yield self
+            return
+        with self.lock():
+            self._read()
+            self._in_transaction = True
+            try:
+                yield self
+            except BaseException:
+                self._in_transaction = False
+                raise
+            self._in_transaction = False
+            self._write()
+
+    def _index(self, val):
+        return xlist.index(self.data, lambda d: d[self.fk] == val)
+
+    def add(self, item, index=-1):
+        with self.lock():
+            self._read()
+            if self._index(item[self.fk]) == -1:
+                self.data.insert(index, item)
+                self._write()
+
+    def remove(self, val):
+        with self.lock():
+            self._read()
+            index = self._index(val)
+            if index > -1:
+                self.data.pop(index)
+                self._write()
+
+    def get(self, val):
+        with self.lock(shared=True):
+            self._read()
+            return xlist.get(self.data, lambda d: d[self.fk] == val)
+
+    def has(self, val):
+        with self.lock(shared=True):
+            self._read()
+            return self._index(val) > -1
+
+
+def _file_stamp(fp: str):
+    try:
+        st = os.stat(fp)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class IndexedLocalStorage:
+    """
+    `LocalStorage` 的索引版本，接口相同。
+    - 快照文件 `fp` 与 `LocalStorage` 的格式相同 (JSON 数组)
+    - 变更以 JSON 行的形式追加到日志文件 `{fp}.log`，日志超过 `compact_every` 条时合并到快照中
+    - 内存中维护 `fk -> item` 的索引；每次操作前只检查文件的 inode/size/mtime，
+      文件被其他进程修改时才重新读取 (日志只读取新增的部分)
+    - 与 `LocalStorage` 使用相同的锁文件；`transaction()` 中的多次修改只追加、fsync 一次日志
+    """
+
+    def __init__(self, fp: str, fk=None, compact_every=1000) -> None:
+        self.filepath = fp
+        self.logpath = fp + ".log"
+        self.fk = fk
+        self.compact_every = compact_every
+        self.index = {}
+        self.lock = FileLock(fp + ".lock")
+        self._snapshot_stamp = False
+        self._log_stamp = None
+        self._log_offset = 0
+        self._log_ops = 0
+        self._pending = None
+
+    @property
+    def data(self):
+        with self.lock(shared=True):
+            self._sync()
+            return list(self.index.values())
+
+    def _apply(self, op):
+        if op["op"] == "add":
+            item = op["item"]
+            self.index.setdefault(item[self.fk], item)
+        elif op["op"] == "remove":
+            self.index.pop(op["key"], None)
+
+    def _replay_log(self):
+        with open(self.logpath, "rb") as fr:
+            fr.seek(self._log_offset)
+            content = fr.read()
+        end = content.rfind(b"\n") + 1
+        for line in content[:end].splitlines():
+            if line:
+                self._apply(xio.json_loads(line))
+                self._log_ops += 1
+        self._log_offset += end
+
+    def _sync(self):
+        if self._pending is not None:
+            return
+        snapshot_stamp = _file_stamp(self.filepath)
+        log_stamp = _file_stamp(self.logpath)
+        if snapshot_stamp == self._snapshot_stamp and log_stamp == self._log_stamp:
+            return
+        if snapshot_stamp != self._snapshot_stamp or log_stamp is None or log_stamp[1] < self._log_offset:
+            self.index = {}
+            for item in xio.read_json(self.filepath, default=[]):
+                self.index[item[self.fk]] = item
+            self._log_offset = 0
+            self._log_ops = 0
+        if log_stamp is not None:
+            self._replay_log()
+        self._snapshot_stamp = snapshot_stamp
+        self._log_stamp = _file_stamp(self.logpath)
+
+    def _append(self, op):
+        if self._pending is not None:
+            self._pending.append(op)
+        else:
+            self._write_log([op])
+
+    def _write_log(self, ops):
+        content = b"".join(xio.json_dumpb(op) + b"\n" for op in ops)
+        created = not os.path.exists(self.logpath)
+        with open(self.logpath, "ab") as fw:
+            fw.write(content)
+            fw.flush()
+            os.fsync(fw.fileno())
+        if created:
+            xio.fsync_dir(os.path.dirname(os.path.abspath(self.logpath)))
+        self._log_ops += len(ops)
+        # 写日志时持有排他锁，文件大小不一致说明有不加锁的写入者，留待下次同步时重放 (重放是幂等的)
+        log_stamp = _file_stamp(self.logpath)
+        if log_stamp[1] == self._log_offset + len(content):
+            self._log_offset += len(content)
+            self._log_stamp = log_stamp
+        if self._log_ops >= self.compact_every:
+            self.compact()
+
+    @contextmanager
+    def transaction(self):
+        """在排他锁内同步一次索引，退出时 (没有异常的情况下) 一次性写入所有变更"""
+        if self._pending is not None:
+            yield self
+            return
+        with self.lock():
+            self._sync()
+            self._pending = []
+            try:
+                yield self
+            except BaseException:
+                self._pending = None
+                self._snapshot_stamp = False  # 丢弃内存中的修改，下次操作时重新读取
+                raise
+            ops, self._pending = self._pending, None
+            if ops:
+                self._write_log(ops)
+
+    def compact(self):
+        """将日志合并到快照中"""
+        with self.lock():
+            self._sync()
+            xio.write_json(list(self.index.values()), self.filepath, fsync=True)
+            fs.rmfiles(self.logpath)
+            self._snapshot_stamp = _file_stamp(self.filepath)
+            self._log_stamp = None
+            self._log_offset = 0
+            self._log_ops = 0
 
     def add(self, item, index=-1):
-        self._read()
-        if not self.has(item[self.fk]):
-            self.data.insert(index, item)
-        self._write()
+        """新元素总是追加到末尾，`index` 仅为兼容 `LocalStorage` 而保留"""
+        with self.lock():
+            self._sync()
+            if item[self.fk] not in self.index:
+                self.index[item[self.fk]] = item
+                self._append({"op": "add", "item": item})
 
     def remove(self, val):
-        self._read()
-        index = xlist.index(self.data, lambda d: d[self.fk] == val)
-        self.data.pop(index)
-        self._write()
+        with self.lock():
+            self._sync()
+            if val in self.index:
+                del self.index[val]
+                self._append({"op": "remove", "key": val})
 
     def get(self, val):
-        self._read()
-        return xlist.get(self.data, lambda d: d[self.fk] == val)
+        with self.lock(shared=True):
+            self._sync()
+            return self.index.get(val)
 
     def has(self, val):
-        self._read()
-        index = xlist.index(self.data, lambda d: d[self.fk] == val)
-        return index > -1
+        with self.lock(shared=True):
+            self._sync()
+            return val in self.index
@@ -185,3 +185,141 @@ def validate_data_v2(rawdata: dict, rules: Mapping[str, RoRecord], packet_name="
         filtered_data[field] = value
 
     return filtered_data
+
+
+class ValidateIssue:
+    """
+    结构化的验证错误记录，消息仅在访问 `message` 时才格式化。
+    - `path`: 出错字段的路径，由字段名称和列表下标组成
+    - `code`: 错误类型，见 `ISSUE_TEMPLATES`
+    - `params`: 格式化消息所需的参数
+    """
+
+    __slots__ = ("path", "code", "params")
+
+    def __init__(self, path: tuple, code: str, params: Mapping[str, Any]) -> None:
+        self.path = path
+        self.code = code
+        self.params = params
+
+    def __repr__(self) -> str:
+        return f"ValidateIssue({self.path!r}, {self.code!r})"
+
+    @property
+    def message(self) -> str:
+        return format_issue(self)
+
+    def json(self, with_message=False):
+        params = {**self.params}
+        if "expected" in params:
+            params["expected"] = _dtypes_str(params["expected"])
+        if "actual" in params:
+            params["actual"] = str(params["actual"])[8:-2]
+        d = {"path": list(self.path), "code": self.code, "params": params}
+        if with_message:
+            d["message"] = self.message
+        return d
+
+
+ISSUE_TEMPLATES = {
+    "required": "字段 {field} 是必须字段",
+    "dtype": "字段 {field} 的值 {value} 应该是 {expected} 类型，但实际上是 {actual} 类型",
+    "item_dtype": "列表字段 {field} 的值 {value} 应该是 {expected} 类型，但实际上是 {actual} 类型",
+    "choices": "枚举字段 {field} 的值 {value} 不在限定的集合 ({choices}) 中",
+    "validator": "字段 {field} 自定义验证失败: {error}",
+}
+
+
+def _format_path(path: tuple):
+    s = ""
+    for p in path:
+        s += f"[{p}]" if isinstance(p, int) else (f".{p}" if s else p)
+    return s
+
+
+def _dtypes_str(dtypes):
+    if not isinstance(dtypes, tuple):
+        dtypes = (dtypes,)
+    return " | ".join([str(dt)[8:-2] for dt in dtypes])
+
+
+def format_issue(issue: ValidateIssue, packet_name="数据集", templates: Mapping[str, str] = None):
+    """将一条验证错误格式化为可读的消息"""
+    params = {**issue.params, "field": _format_path(issue.path)}
+    if "expected" in params:
+        params["expected"] = _dtypes_str(params["expected"])
+    if "actual" in params:
+        params["actual"] = str(params["actual"])[8:-2]
+    if "choices" in params:
+        params["choices"] = ", ".join([str(i) for i in params["choices"]])
+    template = (templates or ISSUE_TEMPLATES)[issue.code]
+    return f"{packet_name or ''}{template.format(**params)}"
+
+
+def _collect_issues(rawdata: dict, rules: Mapping[str, RoRecord], path: list, issues: list):
+    filtered_data = {}
+
+    for field, rule in rules.items():
+        if field not in rawdata:
+            if rule.get("required", False):
+                issues.append(ValidateIssue((*path, field), "required", {}))
+                continue
+            if "default" in rule:
+                rawdata[field] = rule["default"]
+            else:
+                rawdata[field] = None
+                filtered_data[field] = None
+                continue
+
+        value = rawdata.get(field)
+        path.append(field)
+
+        if "dtype" in rule:
+            dtypes = rule["dtype"]
+            if not isinstance(value, dtypes):
+                issues.append(ValidateIssue(tuple(path), "dtype", {"value": value, "expected": dtypes, "actual": type(value)}))
+
+        if isinstance(value, list) and "item_dtype" in rule:
+            item_dtype = rule["item_dtype"]
+            item_rules = rule.get("item_rules")
+            for idx, val in enumerate(value):
+                if not isinstance(val, item_dtype):
+                    params = {"value": val, "expected": item_dtype, "actual": type(val)}
+                    issues.append(ValidateIssue((*path, idx), "item_dtype", params))
+                elif item_rules is not None and isinstance(val, dict):
+                    path.append(idx)
+                    _collect_issues(val, item_rules, path, issues)
+                    path.pop()
+
+        if isinstance(value, dict) and "rules" in rule:
+            _collect_issues(value, rule["rules"], path, issues)
+
+        if "choices" in rule and value not in (vs := rule["choices"]):
+            issues.append(ValidateIssue(tuple(path), "choices", {"value": value, "choices": vs}))
+
+        if "validator" in rule:
+            try:
+                err = rule["validator"](rawdata)
+            except ValidateDataError as e:
+                err = e.message
+            except Exception as e:
+                err = e.args
+            if err:
+                issues.append(ValidateIssue(tuple(path), "validator", {"error": err}))
+
+        path.pop()
+        filtered_data[field] = value
+
+    return filtered_data
+
+
+def collect_issues(rawdata: dict, rules: Mapping[str, RoRecord]):
+    """
+    与 `validate_data_v2` 使用相同的规则，但不会在第一个错误处停止，也不会在每一层嵌套中引发异常。
+
+    返回 `(filtered_data, issues)`，`issues` 是 `ValidateIssue` 列表，验证通过时为空列表。
+    错误消息只在需要时通过 `issue.message` 或 `format_issue()` 生成。
+    """
+    issues = []
+    filtered_data = _collect_issues(rawdata, rules, [], issues)
+    return filtered_data, issues
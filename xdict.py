@@ -1,5 +1,7 @@
+import keyword
+from operator import attrgetter, itemgetter
 from .types import RoRecord, Record
-from typing import Sequence, Union
+from typing import Mapping, Sequence, Union
 
 
 def split_to_keys(x: Union[str, Sequence[str]]):
@@ -51,13 +53,121 @@ def pick_attrs(obj, keys, allow_none=False):
 
 def omit_keys(dct: RoRecord, keys):
     new_dct: Record = {}
-    kset = split_to_keys(keys)
+    kset = frozenset(split_to_keys(keys))
     for k in dct.keys():
         if k not in kset:
             new_dct[k] = dct[k]
     return new_dct
 
 
+def _as_tuple_getter(getter_cls, keys):
+    if len(keys) == 0:
+        return lambda _: ()
+    if len(keys) == 1:
+        getter = getter_cls(keys[0])
+        return lambda obj: (getter(obj),)
+    return getter_cls(*keys)
+
+
+def _compile_display(keys, attr: bool):
+    """
+    生成 `lambda o: {"a": o["a"], "b": o["b"]}` (或 `o.a`)：字典显示式由一条指令构造，
+    比逐键循环或 `dict(zip(...))` 快一倍。键不能安全地写进源码时返回 None
+    """
+    if attr:
+        if not all(isinstance(k, str) and k.isidentifier() and not keyword.iskeyword(k) for k in keys):
+            return None
+        fields = ", ".join(f"{k!r}: o.{k}" for k in keys)
+    else:
+        if not all(type(k) in (str, int) for k in keys):
+            return None
+        fields = ", ".join(f"{k!r}: o[{k!r}]" for k in keys)
+    return eval(f"lambda o: {{{fields}}}")
+
+
+class Projector:
+    """
+    预编译的字段投影，由 `key_picker` / `key_omitter` / `attr_picker` 创建。
+    - `projector(record)`: 投影单条记录
+    - `projector.map(records)`: 惰性投影多条记录
+    - `projector.values(record)`: picker 按键的顺序返回值的元组，omitter 按记录中的顺序返回剩余字段的值
+    """
+
+    __slots__ = ("keys", "allow_none", "_project", "_values")
+
+    def __init__(self, keys, allow_none, project, values=None):
+        self.keys = keys
+        self.allow_none = allow_none
+        self._project = project
+        self._values = values
+
+    def __call__(self, record) -> Record:
+        return self._project(record)
+
+    def values(self, record) -> tuple:
+        return self._values(record)
+
+    def map(self, records):
+        return map(self._project, records)
+
+
+def key_picker(keys, allow_none=False) -> Projector:
+    """`pick_keys` 的预编译版本：所有键都存在时通过预先生成的字典显示式一次取值，缺少键时回退到 `pick_keys`"""
+    keys = tuple(split_to_keys(keys))
+    getter = _as_tuple_getter(itemgetter, keys)
+    display = _compile_display(keys, attr=False) or (lambda dct: dict(zip(keys, getter(dct))))
+
+    def values(dct):
+        try:
+            return getter(dct)
+        except KeyError:
+            return tuple(dct.get(k) for k in keys)
+
+    def project(dct):
+        try:
+            return display(dct)
+        except KeyError:
+            return pick_keys(dct, keys, allow_none=allow_none)
+
+    return Projector(keys, allow_none, project, values)
+
+
+def key_omitter(keys) -> Projector:
+    """`omit_keys` 的预编译版本：复制整个字典 (C 实现) 后删除要忽略的键，而不是逐键判断"""
+    omitted = tuple(dict.fromkeys(split_to_keys(keys)))
+
+    def project(dct):
+        new_dct = dict(dct)
+        for k in omitted:
+            if k in new_dct:
+                del new_dct[k]
+        return new_dct
+
+    values = lambda dct: tuple(project(dct).values())
+    return Projector(omitted, False, project, values)
+
+
+def attr_picker(keys, allow_none=False) -> Projector:
+    """`pick_attrs` 的预编译版本：所有属性都存在时通过预先生成的字典显示式一次取值，缺少属性时回退到 `pick_attrs`"""
+    keys = tuple(split_to_keys(keys))
+    getter = _as_tuple_getter(attrgetter, keys)
+    display = _compile_display(keys, attr=True) or (lambda obj: dict(zip(keys, getter(obj))))
+
+    def values(obj):
+        try:
+            return getter(obj)
+        except AttributeError:
+            return tuple(getattr(obj, k, None) for k in keys)
+
+    def project(obj):
+        try:
+            return display(obj)
+        except AttributeError:
+            return pick_attrs(obj, keys, allow_none=allow_none)
+
+    return Projector(keys, allow_none, project, values)
+
+
 def pop_keys(dct: Record, keys):
     return {k: dct.pop(k) for k in split_to_keys(keys) if k in dct}
 
@@ -150,6 +260,179 @@ def diff(target, ref):
     return nd, od
 
 
+def _freeze(v):
+    if isinstance(v, PersistentDict):
+        return v
+    if isinstance(v, dict):
+        return PersistentDict(v)
+    if isinstance(v, list):
+        return tuple(_freeze(i) for i in v)
+    return v
+
+
+def _thaw(v):
+    if isinstance(v, PersistentDict):
+        return v.to_dict()
+    if isinstance(v, tuple):
+        return [_thaw(i) for i in v]
+    return v
+
+
+class PersistentDict(Mapping):
+    """
+    不可变的嵌套字典，嵌套的字典转换为 `PersistentDict`，列表转换为元组。
+    `update_incremental` 和 `set_in` 返回新的版本，只复制发生变化的路径，未变化的子树在版本之间共享，
+    因此比较两个版本时相同的子树可以通过 `is` 直接跳过。
+    """
+
+    __slots__ = ("_data", "_hash")
+
+    def __init__(self, data: RoRecord = None):
+        self._data = {k: _freeze(v) for k, v in (data or {}).items()}
+        self._hash = None
+
+    @staticmethod
+    def _make(data: dict) -> "PersistentDict":
+        obj = PersistentDict.__new__(PersistentDict)
+        obj._data = data
+        obj._hash = None
+        return obj
+
+    def __getitem__(self, k):
+        return self._data[k]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, k):
+        return k in self._data
+
+    def __repr__(self) -> str:
+        return f"PersistentDict({self._data!r})"
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if isinstance(other, PersistentDict):
+            if len(other._data) != len(self._data):
+                return False
+            for k, v in self._data.items():
+                if k not in other._data:
+                    return False
+                ov = other._data[k]
+                if ov is not v and ov != v:
+                    return False
+            return True
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def to_dict(self) -> Record:
+        return {k: _thaw(v) for k, v in self._data.items()}
+
+    def get_in(self, keys: Sequence[str], default=None):
+        v = self
+        for k in keys:
+            if not isinstance(v, PersistentDict) or k not in v._data:
+                return default
+            v = v._data[k]
+        return v
+
+    def set_in(self, keys: Sequence[str], value) -> "PersistentDict":
+        """返回将 `keys` 路径上的值设置为 `value` 的新版本，中间缺失的字典自动创建"""
+        k, *rest = keys
+        if rest:
+            child = self._data.get(k)
+            if not isinstance(child, PersistentDict):
+                child = PersistentDict()
+            value = child.set_in(rest, value)
+        else:
+            value = _freeze(value)
+        if k in self._data and self._data[k] is value:
+            return self
+        return PersistentDict._make({**self._data, k: value})
+
+    def update_incremental(self, source: RoRecord, list_policy=LIST_POLICY.ERROR, check_base_types=False) -> "PersistentDict":
+        """与 `update_incremental()` 的更新策略相同，但返回新的版本；没有任何变化时返回自身"""
+        data = self._data
+        changes = {}
+        for k, sv in source.items():
+            if k not in data:
+                changes[k] = _freeze(sv)
+                continue
+
+            tv = data[k]
+            if sv is tv:
+                continue
+
+            if isinstance(sv, Mapping):
+                assert isinstance(tv, PersistentDict), f"{k}: 新值是字典时旧值也必须是字典"
+                nv = tv.update_incremental(sv, list_policy=list_policy, check_base_types=check_base_types)
+                if nv is not tv:
+                    changes[k] = nv
+
+            elif sv == None:
+                if tv is not None:
+                    changes[k] = None
+
+            elif isinstance(sv, (bool, int, float, str)):
+                if sv == tv:
+                    continue
+                if check_base_types:
+                    assert type(tv) == type(sv), f"{k}: 新值类型与旧值不一致 {type(sv)} != {type(tv)}"
+                changes[k] = sv
+
+            elif isinstance(sv, (list, tuple)):
+                assert isinstance(tv, tuple), f"{k}: 新值是列表时旧值也必须是列表"
+                nv = _freeze(sv)
+                if nv == tv:
+                    continue
+                if list_policy == LIST_POLICY.ERROR:
+                    raise Exception("Cannot update `list` element incrementally.")
+                elif list_policy == LIST_POLICY.OVERRIDE:
+                    changes[k] = nv
+                else:
+                    raise ValueError(f"Invalid list policy: {list_policy}")
+
+            else:
+                raise Exception(f"Unsupported data type: {type(tv)}")
+
+        if not changes:
+            return self
+        return PersistentDict._make({**data, **changes})
+
+    def diff(self, ref: "PersistentDict"):
+        """与 `diff(self, ref)` 相同，但跳过两个版本共享的子树，也不输出没有变化的子字典"""
+        nd = {}
+        od = {}
+        for k, v in self._data.items():
+            if k in ref._data:
+                rv = ref._data[k]
+                if rv is v:
+                    continue
+                if isinstance(v, PersistentDict) and isinstance(rv, PersistentDict):
+                    a, b = v.diff(rv)
+                    if a or b:
+                        nd[k], od[k] = a, b
+                elif v != rv:
+                    nd[k] = _thaw(v)
+                    od[k] = _thaw(rv)
+            else:
+                od[k] = _thaw(v)
+        for k, v in ref._data.items():
+            if k not in self._data:
+                nd[k] = _thaw(v)
+        return nd, od
+
+
 def get2(data, keys, raise_=True, default=None):
     for k in split_to_keys(keys):
         if k in data:
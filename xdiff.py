@@ -0,0 +1,172 @@
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+
+class _Missing:
+    """`diff_fields` 中表示字段不存在的哨兵，与值为 None 的字段区分"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class PatchOp(NamedTuple):
+    """
+    补丁操作：
+    - `("insert", key, record, ())`: target 中新增的记录
+    - `("delete", key, None, ())`: target 中删除的记录
+    - `("update", key, None, changes)`: 记录发生变化的字段，`changes` 为 `(path, old, new)` 元组，
+      新增或删除的字段对应的 `old` 或 `new` 为 `MISSING`
+    """
+
+    op: str
+    key: Any
+    record: Any = None
+    changes: Tuple[Tuple[tuple, Any, Any], ...] = ()
+
+
+def diff_fields(new: Any, old: Any, max_depth: Optional[int] = None, fields: Optional[Sequence[str]] = None):
+    """
+    比较两个嵌套字典，返回 `[(path, old, new), ...]`，字段不存在时对应的值为 `MISSING`。相同对象直接跳过；
+    超过 `max_depth` 层的值作为整体比较；`fields` 限定参与比较的顶层字段。
+    """
+    changes = []
+    stack = [((), new, old, fields)]
+    while stack:
+        path, a, b, keys = stack.pop()
+        if keys is None:
+            keys = a.keys() if a.keys() == b.keys() else [*a, *(k for k in b if k not in a)]
+        for k in keys:
+            va = a.get(k, MISSING)
+            vb = b.get(k, MISSING)
+            if va is vb:
+                continue
+            p = (*path, k)
+            if isinstance(va, dict) and isinstance(vb, dict) and (max_depth is None or len(p) < max_depth):
+                stack.append((p, va, vb, None))
+            elif va != vb:
+                changes.append((p, vb, va))
+    return changes
+
+
+def diff_records(
+    target: Iterable[Mapping],
+    ref: Iterable[Mapping],
+    key: Callable[[Mapping], Hashable],
+    fields: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+) -> Iterator[PatchOp]:
+    """基于键哈希比较两组记录，只需要将 `ref` 载入内存。`target` 是新数据，`ref` 是旧数据"""
+    ref_index = {key(d): d for d in ref}
+    seen = set()
+    for d in target:
+        k = key(d)
+        seen.add(k)
+        r = ref_index.get(k)
+        if r is None and k not in ref_index:
+            yield PatchOp("insert", k, d)
+        elif d is not r and d != r and (changes := diff_fields(d, r, max_depth, fields)):
+            yield PatchOp("update", k, None, tuple(changes))
+    for k in ref_index:
+        if k not in seen:
+            yield PatchOp("delete", k)
+
+
+def diff_sorted(
+    target: Iterable[Mapping],
+    ref: Iterable[Mapping],
+    key: Callable[[Mapping], Any],
+    fields: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+) -> Iterator[PatchOp]:
+    """单次遍历比较两组已按键升序排列的记录，内存占用与数据量无关"""
+    _end = object()
+    ti, ri = iter(target), iter(ref)
+    t, r = next(ti, _end), next(ri, _end)
+    while t is not _end and r is not _end:
+        tk, rk = key(t), key(r)
+        if tk < rk:
+            yield PatchOp("insert", tk, t)
+            t = next(ti, _end)
+        elif rk < tk:
+            yield PatchOp("delete", rk)
+            r = next(ri, _end)
+        else:
+            if t is not r and t != r and (changes := diff_fields(t, r, max_depth, fields)):
+                yield PatchOp("update", tk, None, tuple(changes))
+            t, r = next(ti, _end), next(ri, _end)
+    while t is not _end:
+        yield PatchOp("insert", key(t), t)
+        t = next(ti, _end)
+    while r is not _end:
+        yield PatchOp("delete", key(r))
+        r = next(ri, _end)
+
+
+def iter_chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    """将可迭代对象切分为最多 `size` 项的列表，配合 `diff_sorted` 分批输出补丁"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def diff_columns(
+    target: Mapping[str, Sequence],
+    ref: Mapping[str, Sequence],
+    key: str,
+    fields: Optional[Sequence[str]] = None,
+) -> List[PatchOp]:
+    """
+    比较两组列式数据 `{ 列名: 列值 }`，列值为标量。安装了 NumPy 时按列向量化比较，否则逐行比较。
+    插入操作的 `record` 为该行数据的字典。两种方式的结果顺序与 `diff_records` 相同：
+    插入和更新按 `target` 中的行顺序，之后是按 `ref` 中的行顺序的删除。键重复时引发 `ValueError`。
+    """
+    fields = [f for f in (fields or target.keys()) if f != key]
+    try:
+        import numpy as np
+    except ImportError:
+        for name, cols in (("target", target), ("ref", ref)):
+            if len(set(cols[key])) != len(cols[key]):
+                raise ValueError(f"Duplicate key in {name}")
+        rows = lambda cols: ({c: cols[c][i] for c in cols} for i in range(len(cols[key])))
+        return list(diff_records(rows(target), rows(ref), lambda d: d[key], fields=fields))
+
+    tk = np.asarray(target[key])
+    rk = np.asarray(ref[key])
+    for name, k in (("target", tk), ("ref", rk)):
+        if len(np.unique(k)) != len(k):
+            raise ValueError(f"Duplicate key in {name}")
+    _, ti, ri = np.intersect1d(tk, rk, assume_unique=True, return_indices=True)
+
+    # 以 target 中的行号为键
+    changed = {}
+    for f in fields:
+        tv = np.asarray(target[f])[ti]
+        rv = np.asarray(ref[f])[ri]
+        for j in np.nonzero(tv != rv)[0]:
+            changed.setdefault(int(ti[j]), []).append(((f,), rv[j].item(), tv[j].item()))
+
+    ops = []
+    inserted = ~np.isin(tk, rk, assume_unique=True)
+    for i in sorted([*np.nonzero(inserted)[0].tolist(), *changed]):
+        if inserted[i]:
+            ops.append(PatchOp("insert", tk[i].item(), {c: np.asarray(target[c])[i].item() for c in target}))
+        else:
+            ops.append(PatchOp("update", tk[i].item(), None, tuple(changed[i])))
+    for i in np.nonzero(~np.isin(rk, tk, assume_unique=True))[0]:
+        ops.append(PatchOp("delete", rk[i].item()))
+    return ops
@@ -1,13 +1,169 @@
 import os
 import sys
 import json
+import math
+import mmap
+from contextlib import contextmanager
 from os.path import exists
+from typing import IO, Iterable, Iterator
 from .types import Union, T
 
-json_load = json.load
-json_loads = json.loads
-json_dump = json.dumps
-json_dumps = json.dumps
+CHUNK_SIZE = 1 << 20
+
+
+class JsonCodec:
+    """
+    JSON 编解码后端。按 orjson > msgspec > ujson > json 的顺序选择已安装的库，
+    也可以通过环境变量 `ZEX_JSON_BACKEND` 指定。快速后端无法处理的数据或参数会回退到标准库。
+    后端在第一次编解码时才导入和选择。
+
+    与标准库保持兼容：快速后端解析失败时 (例如标准库写入的 `NaN` / `Infinity`) 使用标准库重新解析；
+    orjson/msgspec 会将 NaN 和 ±Infinity 静默写为 null，包含这些值的数据交给标准库序列化。
+    """
+
+    def __init__(self, name: str = None) -> None:
+        self.requested = name
+        self.resolved = False
+        self._name = "json"
+        self._loads = json.loads
+        self._dumpb = None
+        self._decode_errors = ()
+        self._nan_as_null = False
+
+    def _resolve(self):
+        names = [self.requested] if self.requested else ["orjson", "msgspec", "ujson"]
+        for n in names:
+            try:
+                self._setup(n)
+                break
+            except ImportError:
+                continue
+        self.resolved = True
+
+    @property
+    def name(self) -> str:
+        if not self.resolved:
+            self._resolve()
+        return self._name
+
+    def _setup(self, name: str):
+        if name == "orjson":
+            import orjson
+
+            opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            indent2 = opts | orjson.OPT_INDENT_2
+
+            def dumpb(obj, indent=None):
+                if indent is None:
+                    return orjson.dumps(obj, option=opts)
+                if indent == 2:
+                    return orjson.dumps(obj, option=indent2)
+                raise TypeError(indent)
+
+            self._loads = orjson.loads
+            self._dumpb = dumpb
+            self._decode_errors = (orjson.JSONDecodeError,)
+            self._nan_as_null = True
+        elif name == "msgspec":
+            import msgspec
+
+            encoder = msgspec.json.Encoder()
+            decoder = msgspec.json.Decoder()
+
+            def dumpb(obj, indent=None):
+                if indent is not None:
+                    raise TypeError(indent)
+                return encoder.encode(obj)
+
+            self._loads = decoder.decode
+            self._dumpb = dumpb
+            self._decode_errors = (msgspec.DecodeError,)
+            self._nan_as_null = True
+        elif name == "ujson":
+            import ujson
+
+            self._loads = ujson.loads
+            self._dumpb = lambda obj, indent=None: ujson.dumps(obj, ensure_ascii=False, indent=indent or 0).encode("utf-8")
+            self._decode_errors = (ValueError,)
+        elif name == "json":
+            return
+        else:
+            raise ValueError(f"Invalid JSON backend: {name}")
+        self._name = name
+
+    def loads(self, s: Union[bytes, str]):
+        if not self.resolved:
+            self._resolve()
+        try:
+            return self._loads(s)
+        except self._decode_errors:
+            return json.loads(s)
+
+    def dumpb(self, obj, **options) -> bytes:
+        """序列化为 UTF-8 编码的字节串"""
+        if not self.resolved:
+            self._resolve()
+        if self._dumpb is not None and options.keys() <= {"indent"}:
+            try:
+                content = self._dumpb(obj, **options)
+                # 只有输出中出现 null 时才需要检查是否有被替换的非有限浮点数
+                if not (self._nan_as_null and b"null" in content and _has_nonfinite(obj)):
+                    return content
+            except (TypeError, OverflowError, ValueError):
+                pass
+        return json.dumps(obj, default=_tolist, **options).encode("utf-8")
+
+    def dumps(self, obj, **options) -> str:
+        if not self.resolved:
+            self._resolve()
+        if self._dumpb is None or not options.keys() <= {"indent"}:
+            return json.dumps(obj, **options)
+        return self.dumpb(obj, **options).decode("utf-8")
+
+
+def _tolist(obj):
+    """标准库回退时序列化 NumPy 数组和标量"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _has_nonfinite(obj) -> bool:
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if isinstance(o, float):
+            if not math.isfinite(o):
+                return True
+        elif isinstance(o, dict):
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple)):
+            stack.extend(o)
+        elif hasattr(o, "tolist") and hasattr(o, "dtype"):
+            stack.append(o.tolist())
+    return False
+
+
+json_codec = JsonCodec(os.environ.get("ZEX_JSON_BACKEND"))
+
+
+def json_loads(s: Union[bytes, str]):
+    return json_codec.loads(s)
+
+
+def json_load(fr):
+    return json_codec.loads(fr.read())
+
+
+def json_dumps(obj, **options) -> str:
+    return json_codec.dumps(obj, **options)
+
+
+def json_dumpb(obj, **options) -> bytes:
+    return json_codec.dumpb(obj, **options)
+
+
+json_dump = json_dumps
 
 
 def read(filepath: str):
@@ -24,13 +180,221 @@ def write(content: Union[bytes, str], filepath: str, mode=None):
 def read_json(filepath: str, default=None):
     if not exists(filepath):
         return default
-    with open(filepath) as fr:
-        return json.load(fr)
+    with open(filepath, "rb") as fr:
+        return json_codec.loads(fr.read())
+
+
+class atomic_writer:
+    """
+    以二进制模式写入同目录下的临时文件，正常退出时通过 `os.replace` 替换目标文件，异常时删除临时文件。
+    目标文件已存在时保留其权限，否则与 `open()` 新建的文件一样按 umask 设置权限。
+    - `fsync`: 替换前将数据刷新到磁盘，替换后刷新所在目录，使重命名本身在断电后也不会丢失
+    """
+
+    def __init__(self, filepath: str, fsync=False) -> None:
+        self.filepath = filepath
+        self.fsync = fsync
+
+    def __enter__(self):
+        dp = os.path.dirname(os.path.abspath(self.filepath))
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+        while True:
+            self.temp_path = os.path.join(dp, f".{os.path.basename(self.filepath)}.{os.urandom(4).hex()}.temp")
+            try:
+                # 与 `open()` 相同的 0o666 & ~umask，`tempfile.mkstemp` 总是 0o600
+                fd = os.open(self.temp_path, flags, 0o666)
+                break
+            except FileExistsError:
+                continue
+        self.fw = os.fdopen(fd, "wb")
+        return self.fw
+
+    def __exit__(self, exc_type, *_):
+        try:
+            if exc_type is None:
+                self.fw.flush()
+                if self.fsync:
+                    os.fsync(self.fw.fileno())
+            self.fw.close()
+            if exc_type is None:
+                try:
+                    os.chmod(self.temp_path, os.stat(self.filepath).st_mode & 0o777)
+                except FileNotFoundError:
+                    pass
+                os.replace(self.temp_path, self.filepath)
+                if self.fsync:
+                    fsync_dir(os.path.dirname(os.path.abspath(self.filepath)))
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+
+def fsync_dir(dp: str):
+    """将目录项 (新建、重命名) 刷新到磁盘；不支持打开目录的平台 (Windows) 上跳过"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(dp, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json(data: T, filepath: str, atomic=True, fsync=False, **options):
+    """
+    - `atomic`: 先写入临时文件再重命名，读者不会看到写了一半的文件
+    - `fsync`: 重命名前将数据、重命名后将所在目录刷新到磁盘 (仅 `atomic=True` 时有效)
+    - `options`: 传递给 `json.dumps` 的参数；快速后端只支持 `indent=2`，其他参数会使用标准库
+    """
+    content = json_codec.dumpb(data, **options)
+    if not atomic:
+        with open(filepath, "wb") as fw:
+            fw.write(content)
+        return
+    with atomic_writer(filepath, fsync=fsync) as fw:
+        fw.write(content)
+
+
+def write_json_stream(items: Iterable[T], filepath: str, atomic=True, fsync=False):
+    """将可迭代对象逐项序列化写入 JSON 数组文件，不需要在内存中构造完整的数组"""
+
+    def write_items(fw):
+        buf = bytearray(b"[")
+        first = True
+        for item in items:
+            if not first:
+                buf += b","
+            buf += json_codec.dumpb(item)
+            first = False
+            if len(buf) >= 1 << 20:
+                fw.write(buf)
+                buf.clear()
+        buf += b"]"
+        fw.write(buf)
+
+    if not atomic:
+        with open(filepath, "wb") as fw:
+            write_items(fw)
+        return
+    with atomic_writer(filepath, fsync=fsync) as fw:
+        write_items(fw)
+
+
+@contextmanager
+def read_mmap(filepath: str):
+    """以只读方式映射整个文件，返回 `memoryview`；退出上下文后 `memoryview` 失效"""
+    with open(filepath, "rb") as fr:
+        if os.fstat(fr.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def read_range(filepath: str, offset: int, size: int) -> bytes:
+    """读取文件中 `[offset, offset + size)` 范围的字节"""
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        return os.pread(fd, size, offset)
+    finally:
+        os.close(fd)
+
+
+_MAGICS = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+)
+_SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".xz": "xz", ".bz2": "bz2"}
+
+
+def _open_compressed(filepath: str, kind: str, mode: str):
+    if kind == "gzip":
+        import gzip
+
+        return gzip.open(filepath, mode)
+    if kind == "xz":
+        import lzma
+
+        return lzma.open(filepath, mode)
+    if kind == "bz2":
+        import bz2
+
+        return bz2.open(filepath, mode)
+    if kind == "zstd":
+        import zstandard  # fmt:skip
+
+        fileobj = open(filepath, mode)
+        if mode == "rb":
+            # 与 gzip/xz/bz2 一致，读取多帧文件 (例如追加写入或 `cat` 拼接) 的全部帧，而不是在第一帧结束时返回 EOF
+            return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=True, read_across_frames=True)
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=True)
+    raise ValueError(kind)
+
+
+def open_stream(filepath: str, mode="rb", buffering=CHUNK_SIZE) -> IO[bytes]:
+    """
+    以二进制流打开文件，透明处理压缩格式。
+    - 读取时根据文件头识别 gzip / zstd / xz / bz2
+    - 写入时根据扩展名 (`.gz` / `.zst` / `.xz` / `.bz2`) 选择压缩格式
+    zstd 需要安装 `zstandard`。
+    """
+    if mode not in ("rb", "wb", "ab"):
+        raise ValueError(f"Invalid mode: {mode}")
+    if mode == "rb":
+        with open(filepath, "rb") as fr:
+            head = fr.read(6)
+        kind = next((k for magic, k in _MAGICS if head.startswith(magic)), None)
+    else:
+        kind = _SUFFIXES.get(os.path.splitext(filepath)[1])
+    if kind is None:
+        return open(filepath, mode, buffering=buffering)
+    return _open_compressed(filepath, kind, mode)
+
+
+def iter_records(filepath: str, sep=b"\n", chunk_size=CHUNK_SIZE) -> Iterator[bytes]:
+    """以大块读取的方式逐条产出以 `sep` 分隔的记录 (不包括分隔符)，支持压缩文件"""
+    with open_stream(filepath) as fr:
+        rest = b""
+        while chunk := fr.read(chunk_size):
+            records = (rest + chunk).split(sep)
+            rest = records.pop()
+            yield from records
+        if rest:
+            yield rest
+
+
+def iter_lines(filepath: str, encoding="utf-8", chunk_size=CHUNK_SIZE) -> Iterator[str]:
+    """逐行产出文本 (不包括换行符)，内存占用与文件大小无关"""
+    for line in iter_records(filepath, b"\n", chunk_size):
+        yield line.decode(encoding)
+
+
+def read_ndjson(filepath: str, chunk_size=CHUNK_SIZE) -> Iterator[T]:
+    """逐行解析 NDJSON 文件，跳过空行"""
+    loads = json_codec.loads
+    for line in iter_records(filepath, b"\n", chunk_size):
+        if line.strip():
+            yield loads(line)
 
 
-def write_json(data: T, filepath: str, **options):
-    with open(filepath, "w") as fw:
-        json.dump(data, fw, **options)
+def write_ndjson(items: Iterable[T], filepath: str, append=False):
+    """逐项写入 NDJSON 文件，按扩展名压缩"""
+    dumpb = json_codec.dumpb
+    with open_stream(filepath, "ab" if append else "wb") as fw:
+        buf = bytearray()
+        for item in items:
+            buf += dumpb(item)
+            buf += b"\n"
+            if len(buf) >= CHUNK_SIZE:
+                fw.write(buf)
+                buf.clear()
+        fw.write(buf)
 
 
 def calculate_md5(file_path: str):
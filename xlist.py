@@ -1,4 +1,4 @@
-from typing import Sequence, Callable, Union, List
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Sequence, Union
 from .types import T
 
 
@@ -91,17 +91,134 @@ def update(target: List[T], source: Sequence[T], key=None, merge=None):
     if merge is None:
         merge = lambda t, s: s
 
-    ta = list(range(len(target)))
-    tk_dict = {i: key(target[i]) for i in ta}
+    # 键重复时匹配第一个元素；追加的元素不参与后续匹配
+    t_keys = [key(item) for item in target]
+    s_keys = [key(item) for item in source]
+    try:
+        tk_index = {}
+        for i, k in enumerate(t_keys):
+            tk_index.setdefault(k, i)
+        found = [tk_index.get(k) for k in s_keys]
+    except TypeError:
+        # 键不可哈希时 (例如默认的 key 作用于字典元素) 退回逐个比较
+        found = [next((i for i, t_k in enumerate(t_keys) if t_k == k), None) for k in s_keys]
+
+    for item, i in zip(source, found):
+        if i is None:
+            target.append(item)
+        else:
+            target[i] = merge(target[i], item)
+
+    return target
+
+
+class MERGE_MODE:
+    UPSERT = 0  # 更新已存在的元素，追加不存在的元素
+    INSERT_ONLY = 1  # 只追加不存在的元素
+    UPDATE_ONLY = 2  # 只更新已存在的元素
+
+
+class DUPLICATE_POLICY:
+    FIRST = 0  # 匹配第一个键相同的元素
+    LAST = 1  # 匹配最后一个键相同的元素
+    ERROR = 2  # 键重复时引发异常
+
+
+def merge_by_key(
+    target: List[T],
+    source: Iterable[T],
+    key: Callable[[T], Hashable] = None,
+    merge: Callable[[T, T], T] = None,
+    mode=MERGE_MODE.UPSERT,
+    duplicate=DUPLICATE_POLICY.FIRST,
+):
+    """
+    基于键索引合并两个列表，时间复杂度为 O(n+m)。
+    - `mode`: 合并模式，见 `MERGE_MODE`
+    - `duplicate`: `target` 中或 `source` 中键重复时的处理策略，见 `DUPLICATE_POLICY`。
+      `source` 中的后续重复元素与此前已合并或追加的元素再次合并
+    """
+    if key is None:
+        key = lambda x: x
+    if merge is None:
+        merge = lambda t, s: s
 
+    tk_index = {}
+    for i, item in enumerate(target):
+        k = key(item)
+        if k in tk_index:
+            if duplicate == DUPLICATE_POLICY.ERROR:
+                raise KeyError(f"Duplicate key in target: {k}")
+            if duplicate == DUPLICATE_POLICY.FIRST:
+                continue
+        tk_index[k] = i
+
+    seen = set() if duplicate == DUPLICATE_POLICY.ERROR else None
     for item in source:
-        s_k = key(item)
-        for i in ta:
-            t_k = tk_dict[i]
-            if t_k == s_k:
-                target[i] = merge(target[i], item)
-                break
-        else:
-            target.append(item)
+        k = key(item)
+        if seen is not None:
+            if k in seen:
+                raise KeyError(f"Duplicate key in source: {k}")
+            seen.add(k)
+        i = tk_index.get(k)
+        if i is None:
+            if mode != MERGE_MODE.UPDATE_ONLY:
+                tk_index[k] = len(target)
+                target.append(item)
+        elif mode != MERGE_MODE.INSERT_ONLY:
+            target[i] = merge(target[i], item)
 
     return target
+
+
+def merge_sorted(
+    target: Iterable[T],
+    source: Iterable[T],
+    key: Callable[[T], Any] = None,
+    merge: Callable[[T, T], T] = None,
+    mode=MERGE_MODE.UPSERT,
+) -> Iterator[T]:
+    """
+    单次遍历合并两个已按键升序排列的可迭代对象，按键顺序产出合并后的元素，适用于无法全部载入内存的数据。
+    `source` 中连续的重复键元素会依次合并到同一个元素上，与 `merge_by_key` 相同：
+    不在 `target` 中的重复键只产出一个元素 (INSERT_ONLY 模式下保留第一个)。
+    """
+    if key is None:
+        key = lambda x: x
+    if merge is None:
+        merge = lambda t, s: s
+
+    _end = object()
+    ti, si = iter(target), iter(source)
+    t, s = next(ti, _end), next(si, _end)
+
+    def source_run(s):
+        """将 `source` 中与 `s` 键相同的后续元素合并到 `s` 上，返回合并结果和下一个元素"""
+        sk = key(s)
+        after = next(si, _end)
+        while after is not _end and key(after) == sk:
+            if mode != MERGE_MODE.INSERT_ONLY:
+                s = merge(s, after)
+            after = next(si, _end)
+        return s, after
+
+    while t is not _end and s is not _end:
+        tk, sk = key(t), key(s)
+        if tk < sk:
+            yield t
+            t = next(ti, _end)
+        elif sk < tk:
+            item, s = source_run(s)
+            if mode != MERGE_MODE.UPDATE_ONLY:
+                yield item
+        else:
+            if mode != MERGE_MODE.INSERT_ONLY:
+                t = merge(t, s)
+            s = next(si, _end)
+    while t is not _end:
+        yield t
+        t = next(ti, _end)
+    if mode != MERGE_MODE.UPDATE_ONLY:
+        while s is not _end:
+            item, s = source_run(s)
+            yield item
@@ -1,10 +1,16 @@
 #!/bin/env python
 import os
-from os.path import exists, join, relpath, dirname, abspath, basename
+import json
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, join, dirname, abspath, basename
 
 source_dir: str = abspath(dirname(__file__))
 allowed_extensions = [".py", ".txt", "safe_builtins"]
 
+# 目标目录中的清单文件：记录源目录的结构和每个链接文件的 inode
+MANIFEST = ".zlink.json"
+MANIFEST_VERSION = 1
+
 
 def select(s: str):
     for x in allowed_extensions:
@@ -24,37 +30,171 @@ def are_hard_links(file1, file2):
         return False
 
 
+def scan(root: str, previous=None):
+    """
+    遍历源目录，返回 `{ 相对目录: [mtime_ns, [子目录], { 文件名: inode }] }`。
+    目录的 mtime 在其中的条目增删或重命名时才会变化，因此 mtime 与 `previous` 中一致的目录直接复用，
+    不需要 scandir，未变化的目录树只需要每个目录一次 stat
+    """
+    previous = previous or {}
+    dirs = {}
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        path = join(root, rel)
+        mtime = os.stat(path).st_mtime_ns
+        prev = previous.get(rel)
+        if prev and prev[0] == mtime:
+            dirs[rel] = prev
+        else:
+            subdirs, files = [], {}
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif select(entry.name) and entry.is_file(follow_symlinks=False):
+                        files[entry.name] = entry.inode()
+            dirs[rel] = [mtime, sorted(subdirs), files]
+        stack.extend(join(rel, d) for d in dirs[rel][1])
+    return dirs
+
+
+def load_manifest(dest_dir: str):
+    try:
+        with open(join(dest_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "source": None, "dirs": {}, "files": {}}
+
+
+def save_manifest(dest_dir: str, manifest):
+    fp = join(dest_dir, MANIFEST)
+    with open(fp + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(fp + ".tmp", fp)
+
+
+def plan(dest_dir: str, files, linked, verify=False):
+    """
+    比较源文件 `files` 与上次链接的文件 `linked` (均为 `{ 相对路径: inode }`)，返回
+    `{"add": [...], "update": [...], "remove": [...], "conflict": [...]}`。
+    inode 与清单一致的文件视为未变化，`verify` 为 True 时检查目标文件的实际 inode
+    """
+    diff = {"add": [], "update": [], "remove": [], "conflict": []}
+
+    def dest_inode(rfp):
+        try:
+            return os.stat(join(dest_dir, rfp), follow_symlinks=False).st_ino
+        except FileNotFoundError:
+            return None
+
+    for rfp, ino in files.items():
+        old = linked.get(rfp)
+        if old == ino and not verify:
+            continue
+        current = dest_inode(rfp)
+        if current == ino:
+            if old != ino:
+                diff["add"].append(rfp)  # 已经是硬链接，只需要记录到清单
+            continue
+        if current is None:
+            diff["add"].append(rfp)
+        elif current == old:
+            diff["update"].append(rfp)  # 源文件被替换 (inode 变化)，重新链接
+        else:
+            diff["conflict"].append(rfp)  # 目标文件不是由 zlink 创建的
+    for rfp, ino in linked.items():
+        if rfp not in files:
+            diff["remove"].append(rfp)
+    return diff
+
+
+def apply(src_dir: str, dest_dir: str, diff, linked, workers=8):
+    """按照 `plan` 的结果并行创建、替换和删除链接，返回新的 `{ 相对路径: inode }`"""
+    linked = dict(linked)
+
+    def link(rfp):
+        ofp, nfp = join(src_dir, rfp), join(dest_dir, rfp)
+        if are_hard_links(ofp, nfp):
+            return rfp, os.stat(ofp).st_ino
+        tmp = f"{nfp}.zlink"
+        if exists(tmp):
+            os.unlink(tmp)
+        os.link(ofp, tmp)
+        os.replace(tmp, nfp)
+        return rfp, os.stat(nfp).st_ino
+
+    for d in sorted({dirname(join(dest_dir, rfp)) for rfp in diff["add"]}):
+        os.makedirs(d, exist_ok=True)
+    with ThreadPoolExecutor(workers) as pool:
+        for rfp, ino in pool.map(link, diff["add"] + diff["update"]):
+            linked[rfp] = ino
+
+    for rfp in diff["remove"]:
+        nfp = join(dest_dir, rfp)
+        try:
+            if os.stat(nfp, follow_symlinks=False).st_ino == linked[rfp]:
+                os.unlink(nfp)
+        except FileNotFoundError:
+            pass
+        del linked[rfp]
+        # 删除变空的目录
+        d = dirname(nfp)
+        while d != dest_dir and d.startswith(dest_dir):
+            try:
+                os.rmdir(d)
+            except OSError:
+                break
+            d = dirname(d)
+    return linked
+
+
+def sync(dest_dir: str, dry_run=False, workers=8, verify=False, scanned=None):
+    """
+    将源目录同步为 `dest_dir` 中的硬链接。`scanned` 为本进程中已经得到的 `scan` 结果 (同步多个目标时复用)。
+    返回 `(diff, dirs)`，`dry_run` 时只返回差异，不修改目标目录
+    """
+    dest_dir = abspath(dest_dir)
+    manifest = load_manifest(dest_dir)
+    previous = scanned or (manifest["dirs"] if manifest["source"] == source_dir else None)
+    dirs = scan(source_dir, previous)
+    files = {join(rel, fn): ino for rel, (_, _, fns) in dirs.items() for fn, ino in fns.items()}
+    diff = plan(dest_dir, files, manifest["files"], verify=verify)
+
+    if dry_run:
+        return diff, dirs
+    if diff["conflict"]:
+        raise FileExistsError(join(dest_dir, diff["conflict"][0]))
+    os.makedirs(dest_dir, exist_ok=True)
+    linked = apply(source_dir, dest_dir, diff, manifest["files"], workers=workers)
+    save_manifest(dest_dir, {"version": MANIFEST_VERSION, "source": source_dir, "dirs": dirs, "files": linked})
+    return diff, dirs
+
+
 def main(args):
-    dest_dir: str = abspath(args.dest_dir)
-    if basename(dest_dir) != "zex":
-        dest_dir = join(dest_dir, "zex")
-
-    if not exists(dest_dir):
-        os.makedirs(dest_dir)
-
-    items = []
-    for dp, _, fns in os.walk(source_dir):
-        for fn in fns:
-            if select(fn):
-                ofp = join(dp, fn)
-                rfp = relpath(ofp, source_dir)
-                nfp = join(dest_dir, rfp)
-                if exists(nfp):
-                    if not are_hard_links(ofp, nfp):
-                        raise FileExistsError(nfp)
-                    continue
-                nfd = dirname(nfp)
-                if not exists(nfd):
-                    os.makedirs(nfd)
-                items.append((ofp, nfp))
-
-    for a in items:
-        os.link(*a)
+    scanned = None
+    for dest_dir in args.dest_dir:
+        dest_dir = abspath(dest_dir)
+        if basename(dest_dir) != "zex":
+            dest_dir = join(dest_dir, "zex")
+        diff, scanned = sync(dest_dir, dry_run=args.dry_run, workers=args.workers, verify=args.verify, scanned=scanned)
+        if args.dry_run or any(diff.values()):
+            print(f"{dest_dir}: " + ", ".join(f"{len(v)} {k}" for k, v in diff.items()))
+        if args.dry_run:
+            for k, v in diff.items():
+                for rfp in v:
+                    print(f"  {k:<8} {rfp}")
 
 
 if __name__ == "__main__":
     from argparse import ArgumentParser  # fmt:skip
     parser = ArgumentParser()
-    parser.add_argument("dest_dir")
+    parser.add_argument("dest_dir", nargs="+")
+    parser.add_argument("--dry-run", action="store_true", help="只输出将要发生的变化")
+    parser.add_argument("--verify", action="store_true", help="检查每个目标文件的 inode，而不是信任清单")
+    parser.add_argument("--workers", type=int, default=8)
     args = parser.parse_args()
     main(args)